@@ -0,0 +1,100 @@
+"""Requests/sec and latency percentiles: threaded Flask app vs ASGI (Quart + psycopg 3).
+
+Starts both servers locally against the database from .env and drives them
+with the same keep-alive HTTP load at each concurrency level:
+
+    python benchmarks/bench_asgi.py --concurrency 16 64 256 --duration 20
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+SERVERS = {
+    'sync': lambda port: [sys.executable, '-c',
+                          f"from main import app; app.run(host='127.0.0.1', port={port}, threaded=True)"],
+    'async': lambda port: [sys.executable, '-m', 'hypercorn', 'asgi_main:app', '--bind', f'127.0.0.1:{port}'],
+}
+
+
+def wait_for_port(port: int, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Сервер на порту {port} не поднялся")
+
+
+def load(port: int, path: str, concurrency: int, duration: float) -> dict:
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker() -> None:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    raise http.client.HTTPException(response.status)
+                local.append(time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+
+    def percentile(fraction: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000 if latencies else 0.0
+
+    return {'rps': len(latencies) / duration, 'p50': percentile(0.5), 'p99': percentile(0.99), 'errors': errors[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[16, 64, 256])
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--path', default='/display_table?table_name=visits')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f'{"server":>6} {"conc":>5} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for offset, (name, command) in enumerate(SERVERS.items()):
+        port = args.port + offset
+        server = subprocess.Popen(command(port), cwd=SRC, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            load(port, args.path, 4, 2)  # прогрев пула и кэшей
+            for concurrency in args.concurrency:
+                result = load(port, args.path, concurrency, args.duration)
+                print(f'{name:>6} {concurrency:>5} {result["rps"]:>9.1f} {result["p50"]:>8.1f} '
+                      f'{result["p99"]:>8.1f} {result["errors"]:>7}')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Overhead of query instrumentation per statement.
+
+Runs the same trivial statement through a plain psycopg2 cursor (what the app
+uses with METRICS_ENABLED=0) and through InstrumentedCursor:
+
+    python benchmarks/bench_instrumentation.py --statements 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import psycopg2  # noqa: E402
+from psycopg2 import extensions  # noqa: E402
+
+from config import DB_PARAMS  # noqa: E402
+from database.instrumentation import InstrumentedCursor, metrics  # noqa: E402
+
+
+def run(connection, cursor_factory, statements: int) -> float:
+    with connection.cursor(cursor_factory=cursor_factory) as cursor:
+        start = time.perf_counter()
+        for _ in range(statements):
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        return (time.perf_counter() - start) / statements * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--statements', type=int, default=20_000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    # порог выше любого времени запроса: меряем только учёт, без журнала медленных
+    metrics.configure(True, slow_query_ms=60_000)
+    connection = psycopg2.connect(**DB_PARAMS)
+    connection.autocommit = True
+    plain = min(run(connection, extensions.cursor, args.statements) for _ in range(args.rounds))
+    instrumented = min(run(connection, InstrumentedCursor, args.statements) for _ in range(args.rounds))
+    connection.close()
+
+    print(f'plain cursor:        {plain:8.2f} us/statement')
+    print(f'instrumented cursor: {instrumented:8.2f} us/statement')
+    print(f'overhead:            {instrumented - plain:8.2f} us/statement ({(instrumented / plain - 1) * 100:.1f}%)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Time-to-first-byte and peak RSS of the old full-table read vs keyset pages.
+
+Fills a table in a scratch schema with N rows via generate_series, then
+measures the full read, the first keyset page and the last one (keyset_deep)
+in a fresh subprocess each so ru_maxrss is per run:
+
+    python benchmarks/bench_pagination.py --rows 10000 1000000 10000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import psycopg2  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from database.pagination import iter_page  # noqa: E402
+
+SCHEMA = 'bench_pagination'
+TABLE = 'bench_pagination_rows'
+MODES = ('fetchall', 'keyset', 'keyset_deep')
+
+
+def connect():
+    load_dotenv()
+    connection = psycopg2.connect(dbname='Clinics', user=os.getenv('USER'), password=os.getenv('PASSWD_DB'),
+                                  host=os.getenv('HOST'), port=int(os.getenv('PORT')))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+    connection.commit()
+    return connection
+
+
+def fill(rows: int) -> None:
+    connection = connect()
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        cursor.execute(f"""
+            CREATE TABLE {TABLE} AS
+            SELECT g AS id, now() - g * INTERVAL '1 minute' AS visit_date, md5(g::text) AS diagnosis,
+                   (g %% 5000)::numeric(10,2) AS cost
+            FROM generate_series(1, %s) g""", (rows,))
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id)")
+        cursor.execute(f"ANALYZE {TABLE}")
+    connection.close()
+
+
+def child(mode: str, limit: int, after: int) -> None:
+    connection = connect()
+    start = time.perf_counter()
+    if mode == 'fetchall':
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT * FROM {TABLE} ORDER BY 1")
+            rows = cursor.fetchall()
+    else:
+        # последняя страница стоит столько же, сколько первая: поиск по индексу ключа, а не пропуск строк
+        rows = list(iter_page(connection, TABLE, 'id', after=after if mode == 'keyset_deep' else None, limit=limit))
+    ttfb = time.perf_counter() - start
+    # ru_maxrss в Linux в килобайтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'mode': mode, 'rows': len(rows), 'ttfb_ms': ttfb * 1000, 'peak_rss_mb': rss}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--child', choices=MODES)
+    parser.add_argument('--after', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.limit, args.after)
+        return
+
+    print(f'{"rows":>10} {"mode":>11} {"ttfb ms":>10} {"rss MB":>8}')
+    try:
+        for rows in args.rows:
+            fill(rows)
+            for mode in MODES:
+                output = subprocess.run([sys.executable, __file__, '--child', mode, '--limit', str(args.limit),
+                                         '--after', str(rows - args.limit)],
+                                        check=True, capture_output=True, text=True).stdout
+                result = json.loads(output)
+                print(f'{rows:>10} {mode:>11} {result["ttfb_ms"]:>10.1f} {result["peak_rss_mb"]:>8.1f}')
+    finally:
+        connection = connect()
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
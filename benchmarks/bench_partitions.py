@@ -0,0 +1,113 @@
+"""Date-range queries on the monthly-partitioned Visits/Vaccinations vs plain unpartitioned copies.
+
+The partitioned tables are the ones in public (after the create_partitioning
+migration); the plain variant is a copy of the same rows in a scratch schema
+with the indexes from create_indexes. For every query the script prints the
+median time over N runs and how many relations the plan actually scans:
+
+    python benchmarks/bench_partitions.py -n 20 --clinic 1
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import psycopg2  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from database.create_database import create_indexes  # noqa: E402
+from database.partitions import MAX_VACCINE_VALIDITY  # noqa: E402
+
+SCHEMA = 'bench_partitions'
+
+TODAY = date.today()
+# те же запросы, что внутри calculate_clinic_revenue и generate_vaccination_reminders
+QUERIES = {
+    'revenue 1 month': ("""
+        SELECT SUM(cost), COUNT(*) FROM Visits
+        WHERE clinic_id = %(clinic)s AND visit_date BETWEEN %(start)s AND %(end)s AND status = 'completed'
+    """, {'start': TODAY - timedelta(days=30), 'end': TODAY}),
+    'revenue 1 year': ("""
+        SELECT SUM(cost), COUNT(*) FROM Visits
+        WHERE clinic_id = %(clinic)s AND visit_date BETWEEN %(start)s AND %(end)s AND status = 'completed'
+    """, {'start': TODAY - timedelta(days=365), 'end': TODAY}),
+    'reminders 30 days': (f"""
+        SELECT p.name, o.phone, v.vaccine_name, v.next_vaccination_date
+        FROM Vaccinations v
+        JOIN Pets p ON v.pet_id = p.pet_id
+        JOIN Owners o ON p.owner_id = o.owner_id
+        WHERE v.next_vaccination_date BETWEEN CURRENT_DATE AND CURRENT_DATE + 30
+          AND v.vaccination_date >= CURRENT_DATE - INTERVAL '{MAX_VACCINE_VALIDITY}'
+          AND v.vaccination_date <= CURRENT_DATE + 30
+        ORDER BY v.next_vaccination_date
+    """, {}),
+}
+
+
+def connect():
+    load_dotenv()
+    connection = psycopg2.connect(dbname='Clinics', user=os.getenv('USER'), password=os.getenv('PASSWD_DB'),
+                                  host=os.getenv('HOST'), port=int(os.getenv('PORT')))
+    connection.autocommit = True
+    return connection
+
+
+def prepare(cursor) -> None:
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    for table in ('visits', 'vaccinations'):
+        cursor.execute(f"CREATE TABLE {SCHEMA}.{table} AS SELECT * FROM public.{table}")
+    # Owners/Pets и классы операторов pg_trgm остаются в public
+    cursor.execute(f"SET search_path TO {SCHEMA}, public")
+    # create_indexes трогает и Owners/Pets, но там IF NOT EXISTS — индексы в public уже есть
+    create_indexes(cursor)
+    cursor.execute("ANALYZE visits; ANALYZE vaccinations")
+
+
+def scanned(plan: dict) -> set:
+    """Relations the plan reads, counting every partition separately"""
+    names = {plan['Relation Name']} if 'Relation Name' in plan else set()
+    for child in plan.get('Plans', ()):
+        names |= scanned(child)
+    return names
+
+
+def measure(cursor, query: str, params: dict, runs: int) -> tuple:
+    cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    relations = scanned(cursor.fetchone()[0][0]['Plan'])
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), len(relations)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('--clinic', type=int, default=1)
+    args = parser.parse_args()
+
+    connection = connect()
+    with connection.cursor() as cursor:
+        print(f'{"query":>18} {"variant":>12} {"median ms":>10} {"relations":>10}')
+        try:
+            prepare(cursor)
+            for name, (query, params) in QUERIES.items():
+                params = dict(params, clinic=args.clinic)
+                for variant, search_path in (('plain', f'{SCHEMA}, public'), ('partitioned', 'public')):
+                    cursor.execute(f"SET search_path TO {search_path}")
+                    median, relations = measure(cursor, query, params, args.runs)
+                    print(f'{name:>18} {variant:>12} {median:>10.2f} {relations:>10}')
+        finally:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
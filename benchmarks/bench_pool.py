@@ -0,0 +1,50 @@
+"""Load benchmark for the pooled connection layer.
+
+Runs the Flask app in-process and hammers /display_table from N worker threads,
+printing requests/sec for every worker count, e.g.:
+
+    python benchmarks/bench_pool.py --table clinics --workers 1 2 4 8 16 --requests 2000
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from main import app, db_pool  # noqa: E402
+
+
+def run(workers: int, total: int, path: str) -> float:
+    def worker(n: int) -> None:
+        client = app.test_client()
+        for _ in range(n):
+            response = client.get(path)
+            assert response.status_code == 200, response.status_code
+
+    per_worker = total // workers
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker, per_worker) for _ in range(workers)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return per_worker * workers / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default='clinics')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    path = f'/display_table?table_name={args.table}'
+    print(f'pool: {db_pool.stats()}')
+    print(f'{"workers":>8} {"req/s":>10}')
+    for workers in args.workers:
+        print(f'{workers:>8} {run(workers, args.requests, path):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Original test_query.sql analytics vs the rewritten report queries.
+
+Run against a large synthetic dataset; every query is executed --repeat
+times and the best wall-clock time is reported:
+
+    python benchmarks/bench_reports.py --repeat 3
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import psycopg2  # noqa: E402
+
+from config import DB_PARAMS  # noqa: E402
+from database.reports import REPORTS  # noqa: E402
+
+# отчёты, чей запрос отличается от оригинала
+REWRITTEN = (9, 10, 12, 14, 16, 17, 18)
+
+
+def original_queries() -> dict:
+    """Numbered queries from test_query.sql, keyed by their '-- N)' comment"""
+    with open(os.path.join(ROOT, 'test_query.sql'), encoding='utf-8') as file:
+        text = file.read()
+    queries = {}
+    for block in re.split(r'^--\s*(?=\d+\))', text, flags=re.MULTILINE)[1:]:
+        number, _, body = block.partition(')')
+        query = body.split('\n', 1)[1].strip().rstrip(';')
+        if query.upper().startswith('SELECT') or query.upper().startswith('WITH'):
+            queries[int(number)] = query
+    return queries
+
+
+def best_time(cursor, query: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(query)
+        cursor.fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    originals = original_queries()
+    connection = psycopg2.connect(**DB_PARAMS)
+    connection.autocommit = True
+    print(f'{"#":>3} {"report":<30} {"original ms":>12} {"rewritten ms":>13} {"speedup":>8}')
+    with connection.cursor() as cursor:
+        for report in REPORTS.values():
+            if report.number not in REWRITTEN:
+                continue
+            original = best_time(cursor, originals[report.number], args.repeat)
+            rewritten = best_time(cursor, report.query, args.repeat)
+            print(f'{report.number:>3} {report.name:<30} {original * 1000:>12.1f} {rewritten * 1000:>13.1f} '
+                  f'{original / rewritten:>7.1f}x')
+    connection.close()
+
+
+if __name__ == '__main__':
+    main()
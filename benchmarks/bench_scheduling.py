@@ -0,0 +1,154 @@
+"""Concurrent booking stress test: old check-then-insert schedule_visit vs the exclusion constraint.
+
+Each variant is built from the real migration steps in a scratch schema;
+'partitioned' also splits Visits by month and adds the month-boundary
+trigger. W worker threads then book the same vets and times at once (every
+slot is also tried 15 minutes later, so near-misses count as overlaps too),
+and the schema is checked for overlapping scheduled visits:
+
+    python benchmarks/bench_scheduling.py --workers 16 --vets 5 --slots 40
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import psycopg2  # noqa: E402
+from psycopg2 import errors  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from database.create_database import create_all_tables, create_procedurs  # noqa: E402
+from database.partitions import create_partitioning, ensure_partitions  # noqa: E402
+from database.scheduling import create_boundary_overlap_check, create_visit_schedule  # noqa: E402
+
+SCHEMA = 'bench_scheduling'
+# последний день месяца далеко в будущем, чтобы окна были «предстоящими»; при 24+ окнах запись
+# переходит через полночь на 1-е, и пересечения на границе секций тоже проверяются
+BASE = datetime(2100, 1, 31, 12, 0)
+# секции по месяцам вокруг BASE: поиск без границы по дате читал бы их все
+PARTITION_MONTHS = (date(2099, 1, 1), date(2100, 12, 1))
+
+
+def connect():
+    load_dotenv()
+    connection = psycopg2.connect(dbname='Clinics', user=os.getenv('USER'), password=os.getenv('PASSWD_DB'),
+                                  host=os.getenv('HOST'), port=int(os.getenv('PORT')))
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f"SET search_path TO {SCHEMA}, public")
+    return connection
+
+
+def prepare(variant: str, vets: int) -> None:
+    connection = connect()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        create_all_tables(cursor)
+        create_procedurs(cursor)
+        if variant != 'legacy':
+            create_visit_schedule(cursor)
+        if variant == 'partitioned':
+            create_partitioning(cursor)
+            create_boundary_overlap_check(cursor)
+            ensure_partitions(cursor, 'visits', *PARTITION_MONTHS)
+        cursor.execute("""
+            INSERT INTO Clinics (name, address, phone, opening_date, working_hours)
+            VALUES ('Bench', 'Bench', '+70000000001', '2000-01-01', '09:00-21:00');
+            INSERT INTO Veterinarians (last_name, first_name, clinic_id, specialization)
+            SELECT 'Vet', 'Bench' || g, 1, 'Терапевт' FROM generate_series(1, %s) g;
+            INSERT INTO Owners (last_name, first_name, phone) VALUES ('Bench', 'Owner', '+70000000000');
+            INSERT INTO Pets (name, owner_id, species) VALUES ('Bench', 1, 'Кошка');
+        """, (vets,))
+    connection.close()
+
+
+def worker(attempts: list, outcome: dict, lock: threading.Lock, start: threading.Barrier) -> None:
+    connection = connect()
+    booked = busy = failed = 0
+    start.wait()
+    with connection.cursor() as cursor:
+        for vet_id, visit_time in attempts:
+            try:
+                cursor.execute("CALL schedule_visit(1, %s, 1, %s, 'bench_scheduling')", (vet_id, visit_time))
+                booked += 1
+            except errors.RaiseException:
+                busy += 1
+            except psycopg2.Error:
+                failed += 1
+    connection.close()
+    with lock:
+        outcome['booked'] += booked
+        outcome['busy'] += busy
+        outcome['failed'] += failed
+
+
+def run(variant: str, workers: int, vets: int, slots: int) -> None:
+    prepare(variant, vets)
+    attempts = [(vet_id, BASE + timedelta(minutes=30 * slot + shift))
+                for vet_id in range(1, vets + 1) for slot in range(slots) for shift in (0, 15)]
+    outcome = {'booked': 0, 'busy': 0, 'failed': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(workers)
+    threads = []
+    for number in range(workers):
+        # у каждого потока свой порядок, чтобы запросы на одно время сталкивались в разные моменты
+        order = attempts[:]
+        random.Random(number).shuffle(order)
+        threads.append(threading.Thread(target=worker, args=(order, outcome, lock, barrier)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    connection = connect()
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*) FROM Visits a JOIN Visits b
+              ON a.vet_id = b.vet_id AND a.visit_id < b.visit_id
+             AND a.status = 'scheduled' AND b.status = 'scheduled'
+             AND a.visit_date > b.visit_date - INTERVAL '30 minutes'
+             AND a.visit_date < b.visit_date + INTERVAL '30 minutes'
+        """)
+        overlaps = cursor.fetchone()[0]
+        slots_ms = None
+        if variant != 'legacy':
+            start = time.perf_counter()
+            cursor.execute("SELECT COUNT(*) FROM find_free_slots(1, %s, %s)",
+                           (BASE.date(), BASE.date() + timedelta(days=6)))
+            cursor.fetchone()
+            slots_ms = (time.perf_counter() - start) * 1000
+    connection.close()
+
+    total = len(attempts) * workers
+    print(f'{variant:>11} {total:>9} {outcome["booked"]:>7} {outcome["busy"]:>7} {outcome["failed"]:>7} '
+          f'{overlaps:>9} {total / elapsed:>9.0f}' + (f' {slots_ms:>12.1f}' if slots_ms is not None else ''))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--vets', type=int, default=5)
+    parser.add_argument('--slots', type=int, default=40, help='получасовых окон на ветеринара')
+    args = parser.parse_args()
+
+    print(f'{"variant":>11} {"attempts":>9} {"booked":>7} {"busy":>7} {"errors":>7} {"overlaps":>9} {"calls/s":>9} '
+          f'{"free slots ms":>12}')
+    try:
+        for variant in ('legacy', 'exclusion', 'partitioned'):
+            run(variant, args.workers, args.vets, args.slots)
+    finally:
+        connection = connect()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""End-to-end benchmark: Flask routes, stored procedures and test_query.sql.
+
+Fill the database first (python src/cli.py generate --scale medium), then:
+
+    python benchmarks/bench_suite.py -n 50 -o results/v2.json
+    python benchmarks/bench_suite.py -n 50 --compare results/v1.json
+
+Results are JSON with p50/p95/mean milliseconds per case, so runs of
+different versions can be diffed case by case.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from bench_reports import original_queries  # noqa: E402
+from main import app, db_pool  # noqa: E402
+
+BENCH_DIAGNOSIS = 'bench_suite'
+
+
+def measure(function, repeat: int) -> dict:
+    samples = []
+    for iteration in range(repeat):
+        start = time.perf_counter()
+        function(iteration)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'n': repeat,
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+    }
+
+
+def scalar(query: str, params=()):
+    with db_pool.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+
+def route_cases(client) -> dict:
+    owner_id = scalar("SELECT MIN(owner_id) FROM Owners")
+    email = scalar("SELECT email FROM Owners WHERE owner_id = %s", (owner_id,))
+    last_visit = scalar("SELECT MAX(visit_id) FROM Visits")
+    clinic_id = scalar("SELECT MIN(clinic_id) FROM Clinics")
+    # питомец с наибольшим числом визитов — худший случай для истории
+    busy_pet = scalar("SELECT pet_id FROM pet_visit_counts ORDER BY visits_count DESC LIMIT 1")
+
+    def check(response) -> None:
+        assert response.status_code < 400, response.status_code
+
+    def revalidate(url: str):
+        # повторная загрузка открытой страницы: браузер присылает ETag, без изменений ответ — 304
+        etag = client.get(url).headers.get('ETag')
+        return lambda i: check(client.get(url, headers={'If-None-Match': etag} if etag else {}))
+
+    def add_and_delete(iteration: int) -> None:
+        phone = f"+7bench{os.getpid()}{iteration:05d}"
+        check(client.post('/add_record/owners', data={'last_name': 'Bench', 'first_name': 'Suite', 'phone': phone}))
+        owner = scalar("SELECT owner_id FROM Owners WHERE phone = %s", (phone,))
+        check(client.post('/delete', data={'id': owner, 'table_name': 'owners'}))
+
+    return {
+        'route:/display_table first page': lambda i: check(client.get('/display_table?table_name=visits')),
+        'route:/display_table revalidate': revalidate('/display_table?table_name=visits'),
+        'route:/display_table deep page': lambda i: check(
+            client.get(f'/display_table?table_name=visits&after={max(last_visit - 100, 0)}')),
+        'route:/display_table search owners': lambda i: check(
+            client.get('/display_table?table_name=owners&search=Иван')),
+        'route:/display_table search pets': lambda i: check(
+            client.get(f'/display_table?table_name=pets&search=Питомец {i + 1}')),
+        'route:/display_table visits by clinic': lambda i: check(client.get(
+            f'/display_table?table_name=visits&filter=clinic_id:{clinic_id}&sort=-visit_date')),
+        'route:/clinics/free_slots': lambda i: check(client.get(f'/clinics/{clinic_id}/free_slots')),
+        'route:/pets/history': lambda i: check(client.get(f'/pets/{busy_pet}/history')),
+        'route:/update': lambda i: check(client.post('/update', data={
+            'id': owner_id, 'table_name': 'owners', 'email': email})),
+        'route:/add_record + /delete': add_and_delete,
+        'route:/add_record form': lambda i: check(client.get('/add_record/pets')),
+    }
+
+
+def procedure_cases() -> dict:
+    clinic_id = scalar("SELECT MIN(clinic_id) FROM Clinics")
+    pet_id = scalar("SELECT MIN(pet_id) FROM Pets")
+    vet_id = scalar("SELECT MIN(vet_id) FROM Veterinarians")
+    # далёкое будущее, чтобы не конфликтовать с реальным расписанием
+    base = datetime(2100, 1, 1, 9, 0) + timedelta(days=random.randrange(10_000))
+
+    def call(query: str, params=()) -> None:
+        with db_pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(query, params)
+
+    return {
+        'procedure:calculate_clinic_revenue': lambda i: call(
+            "CALL calculate_clinic_revenue(%s, '2000-01-01', CURRENT_DATE, NULL, NULL)", (clinic_id,)),
+        'procedure:generate_vaccination_reminders': lambda i: call("CALL generate_vaccination_reminders(30)"),
+        # первая порция напоминаний так, как её читает send_reminders
+        'function:due_vaccination_reminders': lambda i: call(
+            "SELECT * FROM due_vaccination_reminders(30) LIMIT 1000"),
+        'procedure:schedule_visit': lambda i: call(
+            "CALL schedule_visit(%s, %s, %s, %s, %s)",
+            (pet_id, vet_id, clinic_id, base + timedelta(hours=2 * i), BENCH_DIAGNOSIS)),
+    }
+
+
+def query_cases() -> dict:
+    def explain(query: str):
+        def run(_: int) -> None:
+            # EXPLAIN ANALYZE выполняет запрос целиком, но не гоняет миллионы строк по сети
+            with db_pool.connection() as connection, connection.cursor() as cursor:
+                cursor.execute("EXPLAIN (ANALYZE, TIMING OFF, FORMAT JSON) " + query)
+        return run
+
+    return {f'query:{number:02d}': explain(query) for number, query in sorted(original_queries().items())}
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = json.load(file)
+    print(f'\n{"case":<45} {"base p50":>10} {"p50":>10} {"change":>8}')
+    for name, result in results['cases'].items():
+        old = baseline['cases'].get(name)
+        if old is None:
+            continue
+        change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100 if old['p50_ms'] else 0.0
+        print(f'{name:<45} {old["p50_ms"]:>10.2f} {result["p50_ms"]:>10.2f} {change:>+7.1f}%')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--repeat', type=int, default=20)
+    parser.add_argument('--only', choices=['route', 'procedure', 'query'], nargs='+')
+    parser.add_argument('-o', '--output', help="куда сохранить JSON с результатами")
+    parser.add_argument('--compare', help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    cases = {}
+    cases.update(route_cases(app.test_client()))
+    cases.update(procedure_cases())
+    cases.update(query_cases())
+    if args.only:
+        cases = {name: case for name, case in cases.items() if name.split(':')[0] in args.only}
+
+    results = {'version': git_version(), 'timestamp': datetime.now().isoformat(timespec='seconds'),
+               'repeat': args.repeat, 'cases': {}}
+    try:
+        for name, case in cases.items():
+            results['cases'][name] = measure(case, args.repeat)
+            print(f'{name:<45} p50 {results["cases"][name]["p50_ms"]:>10.2f} ms', file=sys.stderr)
+    finally:
+        scalar("WITH d AS (DELETE FROM Visits WHERE diagnosis = %s RETURNING 1) SELECT COUNT(*) FROM d",
+               (BENCH_DIAGNOSIS,))
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    else:
+        print(output)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
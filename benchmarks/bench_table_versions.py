@@ -0,0 +1,149 @@
+"""Concurrent writers with one long transaction: single-row table version vs sharded version rows.
+
+Each variant is built in a scratch schema: 'row' is the former trigger that
+upserts one table_versions row per table, 'sharded' is create_table_versions.
+A long transaction (think `import owners`) updates Owners and holds its locks
+for --hold seconds while W worker threads commit single-row updates of their
+own owners; the script prints worker throughput and commit latency:
+
+    python benchmarks/bench_table_versions.py --workers 8 --hold 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import psycopg2  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from database.create_database import create_all_tables  # noqa: E402
+from database.versions import TRACKED_TABLES, create_table_versions  # noqa: E402
+
+SCHEMA = 'bench_table_versions'
+
+# прежняя схема: одна строка на таблицу, её блокировка держится до COMMIT пишущей транзакции
+ROW_VERSIONS = """
+    CREATE TABLE table_versions (
+        table_name VARCHAR(63) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 1,
+        changed_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+    );
+
+    CREATE FUNCTION bump_table_version() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    BEGIN
+        INSERT INTO table_versions AS t (table_name) VALUES (TG_TABLE_NAME)
+        ON CONFLICT (table_name) DO UPDATE SET version = t.version + 1, changed_at = clock_timestamp();
+        RETURN NULL;
+    END;
+    $$;
+"""
+
+
+def connect():
+    load_dotenv()
+    connection = psycopg2.connect(dbname='Clinics', user=os.getenv('USER'), password=os.getenv('PASSWD_DB'),
+                                  host=os.getenv('HOST'), port=int(os.getenv('PORT')))
+    with connection.cursor() as cursor:
+        cursor.execute(f"SET search_path TO {SCHEMA}, public")
+    connection.commit()
+    return connection
+
+
+def prepare(variant: str, owners: int) -> None:
+    connection = connect()
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        create_all_tables(cursor)
+        if variant == 'row':
+            cursor.execute(ROW_VERSIONS)
+            for table in TRACKED_TABLES:
+                cursor.execute(f"CREATE TRIGGER trg_{table}_version AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                               "FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()")
+        else:
+            create_table_versions(cursor)
+        cursor.execute("""
+            INSERT INTO Owners (last_name, first_name, phone)
+            SELECT 'Bench', 'Owner' || g, '+7' || g FROM generate_series(1, %s) g
+        """, (owners,))
+    connection.close()
+
+
+def long_writer(hold: float, started: threading.Event) -> None:
+    """One transaction writing Owners and committing only after `hold` seconds"""
+    connection = connect()
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE Owners SET address = 'import' WHERE owner_id = 1")
+        started.set()
+        time.sleep(hold)
+    connection.commit()
+    connection.close()
+
+
+def worker(owner_id: int, stop: threading.Event, latencies: list, lock: threading.Lock) -> None:
+    connection = connect()
+    timings = []
+    with connection.cursor() as cursor:
+        while not stop.is_set():
+            start = time.perf_counter()
+            cursor.execute("UPDATE Owners SET address = 'worker' WHERE owner_id = %s", (owner_id,))
+            connection.commit()
+            timings.append((time.perf_counter() - start) * 1000)
+    connection.close()
+    with lock:
+        latencies += timings
+
+
+def run(variant: str, workers: int, hold: float) -> None:
+    prepare(variant, workers + 1)
+    started, stop = threading.Event(), threading.Event()
+    latencies, lock = [], threading.Lock()
+    importer = threading.Thread(target=long_writer, args=(hold, started))
+    importer.start()
+    started.wait()
+    threads = [threading.Thread(target=worker, args=(owner_id, stop, latencies, lock))
+               for owner_id in range(2, workers + 2)]
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    importer.join()
+    # ещё столько же времени после COMMIT долгой транзакции, чтобы было видно и обычную пропускную способность
+    time.sleep(hold)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+    print(f'{variant:>8} {len(latencies):>8} {len(latencies) / elapsed:>10.0f} '
+          f'{statistics.median(latencies) if latencies else 0:>8.2f} {p99:>9.1f} {latencies[-1] if latencies else 0:>9.1f}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--hold', type=float, default=3, help='секунд держать долгую транзакцию открытой')
+    args = parser.parse_args()
+
+    print(f'{"variant":>8} {"commits":>8} {"commits/s":>10} {"p50 ms":>8} {"p99 ms":>9} {"max ms":>9}')
+    try:
+        for variant in ('row', 'sharded'):
+            run(variant, args.workers, args.hold)
+    finally:
+        connection = connect()
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Bulk visit insert with the old COUNT(*) trigger vs the incremental counter.
+
+Each variant is built from the real migration steps in a scratch schema, then
+loaded with one INSERT ... SELECT of N visits spread over P pets. The counter
+variant is then partitioned, hit with upsert imports (DO UPDATE and DO NOTHING)
+and a cross-month UPDATE, and its counters are checked against COUNT(*):
+
+    python benchmarks/bench_visit_counter.py --visits 1000000 --pets 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import psycopg2  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+
+from database.create_database import (create_all_tables, create_trigger, create_indexes,  # noqa: E402
+                                      create_visit_counter)
+from database.partitions import create_partitioning  # noqa: E402
+
+SCHEMA = 'bench_visit_counter'
+
+
+def connect():
+    load_dotenv()
+    connection = psycopg2.connect(dbname='Clinics', user=os.getenv('USER'), password=os.getenv('PASSWD_DB'),
+                                  host=os.getenv('HOST'), port=int(os.getenv('PORT')))
+    connection.autocommit = True
+    return connection
+
+
+def run(cursor, variant: str, visits: int, pets: int) -> float:
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+    # public остаётся в пути поиска: там классы операторов pg_trgm, которые использует create_indexes
+    cursor.execute(f"SET search_path TO {SCHEMA}, public")
+    create_all_tables(cursor)
+    create_trigger(cursor)
+    create_indexes(cursor)
+    if variant == 'counter':
+        create_visit_counter(cursor)
+    cursor.execute("""
+        INSERT INTO Owners (last_name, first_name, phone) VALUES ('Bench', 'Owner', '+70000000000');
+        INSERT INTO Pets (name, owner_id, species)
+        SELECT 'pet' || g, 1, 'Кошка' FROM generate_series(1, %s) g;
+    """, (pets,))
+
+    start = time.perf_counter()
+    cursor.execute("""
+        INSERT INTO Visits (visit_date, pet_id, cost, status)
+        SELECT TIMESTAMP '2025-01-01' + g * INTERVAL '1 minute', 1 + g %% %s, 1000, 'completed'
+        FROM generate_series(1, %s) g
+    """, (pets, visits))
+    elapsed = time.perf_counter() - start
+    print(f'{variant:>8} {visits:>10} {elapsed:>10.2f}')
+    return elapsed
+
+
+def check_counters(cursor, visits: int, pets: int) -> int:
+    """Pets whose counter differs from COUNT(*) after upsert imports and a move between partitions"""
+    create_partitioning(cursor)
+    # то же, что import --upsert: половина строк обновляет существующие визиты, половина — новые
+    cursor.execute("""
+        INSERT INTO Visits (visit_id, visit_date, pet_id, cost, status)
+        SELECT g, TIMESTAMP '2025-01-01' + g * INTERVAL '1 minute', 1 + g %% %s, 2000, 'completed'
+        FROM generate_series(%s - 999, %s + 1000) g
+        ON CONFLICT (visit_id, visit_date) DO UPDATE SET cost = EXCLUDED.cost
+    """, (pets, visits, visits))
+    # import --upsert без обновляемых столбцов: существующие визиты пропускаются
+    cursor.execute("""
+        INSERT INTO Visits (visit_id, visit_date, pet_id, cost, status)
+        SELECT g, TIMESTAMP '2025-01-01' + g * INTERVAL '1 minute', 1 + g %% %s, 3000, 'completed'
+        FROM generate_series(1, 1000) g
+        ON CONFLICT (visit_id, visit_date) DO NOTHING
+    """, (pets,))
+    # перенос в другую месячную секцию — DELETE + INSERT внутри одного UPDATE
+    cursor.execute("UPDATE Visits SET visit_date = visit_date + INTERVAL '2 months' WHERE visit_id <= 1000")
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM (SELECT pet_id, COUNT(*) AS visits FROM Visits WHERE pet_id IS NOT NULL GROUP BY pet_id) v
+        FULL JOIN pet_visit_counts c ON c.pet_id = v.pet_id
+        WHERE COALESCE(v.visits, 0) <> COALESCE(c.visits_count, 0)
+    """)
+    mismatched = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM Visits WHERE pet_id IS NOT NULL AND total_visits_count = 0")
+    unnumbered = cursor.fetchone()[0]
+    print(f'counter check: {mismatched} pets with a wrong counter, {unnumbered} visits without a number')
+    return mismatched + unnumbered
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--visits', type=int, default=1_000_000)
+    parser.add_argument('--pets', type=int, default=10_000)
+    args = parser.parse_args()
+
+    connection = connect()
+    with connection.cursor() as cursor:
+        print(f'{"variant":>8} {"visits":>10} {"seconds":>10}')
+        try:
+            for variant in ('count', 'counter'):
+                run(cursor, variant, args.visits, args.pets)
+            failed = check_counters(cursor, args.visits, args.pets)
+        finally:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    connection.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+import asyncio
+import os
+
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from quart import Quart, Response, request, render_template, redirect, url_for, jsonify
+
+from config import DB_PARAMS, POOL_MIN, POOL_MAX, POOL_TIMEOUT, SCHEMA_TTL
+from database.batch import apply_batch
+from database.cache import TTLCache
+from database.filters import parse_view
+from database.migrations import SERVICE_TABLES, migrate
+from database.pagination import Page, page_query
+from database.pool import ConnectionPool, PoolTimeoutError
+from database.reports import REPORTS, report_etag, report_sql
+from database.schema import SchemaCache
+from database.versions import VERSION_QUERY
+
+# Асинхронный режим: те же маршруты и шаблоны, что в main.py, поверх ASGI и psycopg 3.
+# Запуск: hypercorn asgi_main:app --bind 0.0.0.0:8000
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+MAX_PAGE_SIZE = 1000
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", 60))
+REPORT_ROW_LIMIT = 1000
+BATCH_POOL_MAX = int(os.getenv("BATCH_POOL_MAX", POOL_MAX))
+
+# синхронный пул psycopg2 нужен только для миграций и редкой перезагрузки кэша схемы
+sync_pool = ConnectionPool(1, 2, POOL_TIMEOUT, **DB_PARAMS)
+with sync_pool.connection() as connection:
+    migrate(connection)
+
+schema = SchemaCache(sync_pool, ttl=SCHEMA_TTL, exclude=SERVICE_TABLES)
+# пакетная запись (execute_values из psycopg2) идёт в потоках на отдельном пуле того же размера, что и основной
+batch_pool = ConnectionPool(1, BATCH_POOL_MAX, POOL_TIMEOUT, **DB_PARAMS)
+report_cache = TTLCache(REPORT_CACHE_TTL)
+
+db_pool = AsyncConnectionPool(make_conninfo(**DB_PARAMS), min_size=POOL_MIN, max_size=POOL_MAX,
+                              timeout=POOL_TIMEOUT, kwargs={'autocommit': True},
+                              check=AsyncConnectionPool.check_connection, open=False)
+
+app = Quart(__name__)
+
+
+@app.before_serving
+async def open_pool() -> None:
+    await db_pool.open()
+
+
+@app.after_serving
+async def close_pool() -> None:
+    await db_pool.close()
+    sync_pool.closeall()
+    batch_pool.closeall()
+
+
+@app.errorhandler(PoolTimeout)
+@app.errorhandler(PoolTimeoutError)
+async def pool_exhausted(error):
+    """Any route that waited POOL_TIMEOUT for a connection of any pool answers 503"""
+    return jsonify(error=str(error)), 503
+
+
+async def table_info(table_name):
+    """Cached table metadata; a reload after the TTL runs in a worker thread"""
+    return await asyncio.to_thread(schema.table, table_name)
+
+
+async def table_validators(table_name: str, *variant):
+    """(ETag, Last-Modified) of a response built from one table, None for tables without a change version"""
+    async with db_pool.connection() as connection:
+        cursor = await connection.execute(VERSION_QUERY, (table_name,))
+        row = await cursor.fetchone()
+    if row is None:
+        return None
+    version, changed_at = row
+    return '-'.join(str(part) for part in (table_name, version, *variant)), changed_at
+
+
+def not_modified(etag: str, last_modified=None) -> bool:
+    """Whether the client's copy is current; If-None-Match takes precedence over If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def with_validators(response, etag: str, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/')
+async def index():
+    return await render_template("choice.html", tables=await asyncio.to_thread(schema.tables))
+
+
+@app.route('/display_table', methods=['GET', 'POST'])
+async def display_table():
+    if request.method == 'POST':
+        table_name = (await request.form).get('table_name')
+    else:
+        table_name = request.args.get('table_name')
+    table = await table_info(table_name)
+    if table is None:
+        return redirect(url_for('index'))
+    try:
+        view = parse_view(table, request.args)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    sort_index = None
+    if view.sort is not None and view.sort != table.key:
+        sort_index = table.columns.index(view.sort)
+        after = (request.args.get('after_value'), after) if after is not None else None
+        before = (request.args.get('before_value'), before) if before is not None else None
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    compact = request.args.get('compact', 0, type=int) == 1
+
+    validators = await table_validators(table_name, limit, int(compact)) if request.method == 'GET' else None
+    if validators is not None and not_modified(*validators):
+        return with_validators(Response('', status=304), *validators)
+
+    query, params = page_query(table_name, table.key, after=after, before=before, limit=limit, sql_module=sql,
+                               view=view)
+    async with db_pool.connection() as connection:
+        # страница ограничена limit + 1 строками, серверный курсор здесь не нужен
+        cursor = await connection.execute(query, params)
+        rows = await cursor.fetchall()
+    page = Page(iter(rows), limit, after=after, before=before, key_index=table.key_index, sort_index=sort_index)
+    data = list(page)
+    html = await render_template("tables3.html", table_name=table_name, data=data, page=page,
+                                 columns=table.columns, key=table.key, key_index=table.key_index,
+                                 limit=limit, compact=compact, view=view, view_args=view.url_args())
+    return with_validators(Response(html), *validators) if validators is not None else html
+
+
+@app.route('/delete', methods=['POST'])
+async def delete():
+    form = await request.form
+    table_name = form.get('table_name') or request.args.get('table_name')
+    table = await table_info(table_name)
+    if table is None:
+        return redirect(url_for('index'))
+    async with db_pool.connection() as connection:
+        await connection.execute(f"DELETE FROM {table_name} WHERE {table.key} = %s", (form['id'],))
+    return redirect(url_for('display_table', table_name=table_name))
+
+
+@app.route('/update', methods=['POST'])
+async def update():
+    form = await request.form
+    table_name = form.get('table_name') or request.args.get('table_name')
+    table = await table_info(table_name)
+    if table is None:
+        return redirect(url_for('index'))
+
+    update_data = {key: value for key, value in form.items() if key in table.columns and key != table.key}
+    if update_data:
+        set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
+        values = list(update_data.values())
+        values.append(form['id'])
+        async with db_pool.connection() as connection:
+            await connection.execute(f"UPDATE {table_name} SET {set_clause} WHERE {table.key} = %s", values)
+    return redirect(url_for('display_table', table_name=table_name))
+
+
+@app.route('/batch/<table_name>', methods=['POST'])
+async def batch(table_name):
+    table = await table_info(table_name)
+    if table is None:
+        return jsonify(error=f"Неизвестная таблица {table_name}"), 404
+    payload = await request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Ожидается JSON-объект с полями update и delete"), 400
+    updates, deletes = payload.get('update', []), payload.get('delete', [])
+    if not isinstance(updates, list) or not all(isinstance(change, dict) for change in updates) \
+            or not isinstance(deletes, list):
+        return jsonify(error="update — список объектов, delete — список ключей"), 400
+
+    def run():
+        with batch_pool.connection() as connection:
+            return apply_batch(connection, table, updates, deletes)
+
+    try:
+        result = await asyncio.to_thread(run)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(result)
+
+
+@app.route('/add_record/<table_name>', methods=['GET', 'POST'])
+async def add_record(table_name):
+    table = await table_info(table_name)
+    if table is None:
+        return redirect(url_for('index'))
+
+    if request.method == 'POST':
+        data = {key: value for key, value in (await request.form).items() if key in table.columns}
+        columns = ', '.join(data.keys())
+        placeholders = ', '.join(['%s'] * len(data))
+        async with db_pool.connection() as connection:
+            await connection.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})",
+                                     list(data.values()))
+
+    # импорта CSV в асинхронном режиме нет — форма загрузки не показывается
+    return await render_template('add_record.html', table_name=table_name, columns=table.columns, csv_import=False)
+
+
+@app.route('/reports')
+async def reports():
+    return await render_template('reports.html', reports=REPORTS.values())
+
+
+@app.route('/reports/<name>')
+async def report(name):
+    if name not in REPORTS:
+        return redirect(url_for('reports'))
+    cached = report_cache.get(name)
+    if cached is None:
+        async with db_pool.connection() as connection:
+            cursor = await connection.execute(report_sql(REPORTS[name]), (REPORT_ROW_LIMIT,))
+            result = {"name": name, "title": REPORTS[name].title,
+                      "columns": [column.name for column in cursor.description], "rows": await cursor.fetchall()}
+        cached = result, report_etag(result)
+        if REPORT_CACHE_TTL > 0:
+            report_cache.set(name, cached)
+    result, etag = cached
+    etag = f"{etag}-{request.args.get('format', 'html')}"
+    if not_modified(etag):
+        return with_validators(Response('', status=304), etag)
+    if request.args.get('format') == 'json':
+        return with_validators(jsonify(result), etag)
+    return with_validators(Response(await render_template('report.html', report=result)), etag)
+
+
+if __name__ == '__main__':
+    app.run()
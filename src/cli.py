@@ -0,0 +1,141 @@
+import argparse
+import json
+import sys
+
+from config import DB_PARAMS, SCHEMA_TTL
+from database.bulk_import import BATCH_ROWS, import_csv
+from database.generate_data import SCALES, generate
+from database.export import FORMATS, iter_export, parse_since
+from database.migrations import SERVICE_TABLES
+from database.partitions import MONTHS_AHEAD, PARTITIONED, detach_partitions, maintain_partitions
+from database.pool import ConnectionPool
+from database.reminders import REMINDER_CHUNK, send_reminders
+from database.reports import REPORTS, refresh_reports
+from database.schema import SchemaCache
+
+
+def open_table(db_pool, table_name: str):
+    table = SchemaCache(db_pool, ttl=SCHEMA_TTL, exclude=SERVICE_TABLES).table(table_name)
+    if table is None:
+        sys.exit(f"Неизвестная таблица {table_name}")
+    return table
+
+
+def command_import(db_pool, args) -> None:
+    table = open_table(db_pool, args.table)
+    with open(args.file, encoding='utf-8-sig', newline='') as stream, db_pool.connection() as connection:
+        report = import_csv(connection, table, stream, upsert=args.upsert, batch_rows=args.batch_rows)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def command_export(db_pool, args) -> None:
+    table = open_table(db_pool, args.table)
+    since = parse_since(args.since) if args.since else None
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        with db_pool.connection() as connection:
+            for chunk in iter_export(connection, table, args.format, since=since):
+                output.write(chunk)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def command_refresh_reports(db_pool, args) -> None:
+    unknown = [name for name in args.reports if name not in REPORTS]
+    if unknown:
+        sys.exit(f"Неизвестные отчёты: {', '.join(unknown)}")
+    with db_pool.connection() as connection:
+        timings = refresh_reports(connection, names=args.reports or None)
+    for name, seconds in timings.items():
+        print(f"{name}: {seconds} с")
+
+
+def command_generate(db_pool, args) -> None:
+    counts = dict(SCALES[args.scale])
+    for name in counts:
+        if getattr(args, name) is not None:
+            counts[name] = getattr(args, name)
+    with db_pool.connection() as connection:
+        generate(connection, counts, seed=args.seed)
+
+
+def command_partitions(db_pool, args) -> None:
+    with db_pool.connection() as connection:
+        for name in maintain_partitions(connection, months_ahead=args.ahead):
+            print(f"создана {name}")
+        if args.detach_before:
+            before = parse_since(args.detach_before).date()
+            for table in PARTITIONED:
+                for name in detach_partitions(connection, table, before, archive=not args.drop):
+                    print(f"{'удалена' if args.drop else 'отключена и перенесена в архив'} {name}")
+
+
+def command_reminders(db_pool, args) -> None:
+    output = open(args.output, 'a', encoding='utf-8') if args.output else sys.stdout
+
+    def send(messages: list) -> None:
+        for message in messages:
+            output.write(json.dumps(message, ensure_ascii=False) + '\n')
+        output.flush()
+
+    try:
+        report = send_reminders(db_pool, send, days_ahead=args.days, chunk_rows=args.chunk)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps(report, ensure_ascii=False), file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обслуживание базы Clinics")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_import = commands.add_parser('import', help="загрузить CSV в таблицу через COPY")
+    parser_import.add_argument('table')
+    parser_import.add_argument('file')
+    parser_import.add_argument('--upsert', action='store_true', help="обновлять строки с существующим ключом")
+    parser_import.add_argument('--batch-rows', type=int, default=BATCH_ROWS)
+    parser_import.set_defaults(handler=command_import)
+
+    parser_export = commands.add_parser('export', help="выгрузить таблицу в CSV или JSON lines")
+    parser_export.add_argument('table')
+    parser_export.add_argument('--format', choices=FORMATS, default='csv')
+    parser_export.add_argument('--since', help="только строки с датой визита/вакцинации не раньше указанной")
+    parser_export.add_argument('-o', '--output', help="файл назначения, по умолчанию stdout")
+    parser_export.set_defaults(handler=command_export)
+
+    parser_refresh = commands.add_parser('refresh-reports', help="обновить материализованные отчёты")
+    parser_refresh.add_argument('reports', nargs='*', metavar='report', help="по умолчанию все")
+    parser_refresh.set_defaults(handler=command_refresh_reports)
+
+    parser_generate = commands.add_parser('generate', help="заполнить базу синтетическими данными через COPY")
+    parser_generate.add_argument('--scale', choices=SCALES, default='small')
+    for name in SCALES['small']:
+        parser_generate.add_argument(f'--{name}', type=int, help=f"переопределить объём {name}")
+    parser_generate.add_argument('--seed', type=int, default=42)
+    parser_generate.set_defaults(handler=command_generate)
+
+    parser_partitions = commands.add_parser('partitions', help="создать будущие секции, отключить старые")
+    parser_partitions.add_argument('--ahead', type=int, default=MONTHS_AHEAD, help="месяцев вперёд")
+    parser_partitions.add_argument('--detach-before', metavar='DATE',
+                                   help="отключить секции, целиком лежащие раньше даты")
+    parser_partitions.add_argument('--drop', action='store_true', help="удалять отключённые секции, а не архивировать")
+    parser_partitions.set_defaults(handler=command_partitions)
+
+    parser_reminders = commands.add_parser('reminders', help="выгрузить неотправленные напоминания о прививках")
+    parser_reminders.add_argument('--days', type=int, default=30, help="срок прививки в ближайшие N дней")
+    parser_reminders.add_argument('--chunk', type=int, default=REMINDER_CHUNK, help="напоминаний в порции")
+    parser_reminders.add_argument('-o', '--output', help="файл JSON lines (дописывается), по умолчанию stdout")
+    parser_reminders.set_defaults(handler=command_reminders)
+
+    args = parser.parse_args()
+    db_pool = ConnectionPool(1, 2, **DB_PARAMS)
+    try:
+        args.handler(db_pool, args)
+    finally:
+        db_pool.closeall()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+import os
+from dotenv import load_dotenv
+
+# получение данных для входа
+if not load_dotenv():
+    raise ValueError("Не удалось загрузить .env файл")
+USER = os.getenv("USER")
+PASSWD_DB = os.getenv("PASSWD_DB")
+HOST = os.getenv("HOST")
+PORT = int(os.getenv("PORT"))
+
+DB_PARAMS = dict(dbname='Clinics', user=USER, password=PASSWD_DB, host=HOST, port=PORT)
+
+# параметры пула соединений
+POOL_MIN = int(os.getenv("POOL_MIN", 1))
+POOL_MAX = int(os.getenv("POOL_MAX", 10))
+POOL_TIMEOUT = float(os.getenv("POOL_TIMEOUT", 5))
+
+# время жизни кэша метаданных схемы, секунды
+SCHEMA_TTL = float(os.getenv("SCHEMA_TTL", 300))
+
+# инструментирование запросов: метрики, журнал медленных запросов, EXPLAIN для них
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "0") == "1"
@@ -0,0 +1,93 @@
+from collections import defaultdict
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+MAX_BATCH_ROWS = 5000
+
+
+def _key_cast(table) -> sql.Composable:
+    return sql.SQL(table.column_types.get(table.key, 'text'))
+
+
+def apply_batch(connection, table, updates: list, deletes: list) -> dict:
+    """Apply row updates and deletions in one transaction.
+
+    `updates` is a list of {key: id, column: value, ...} dicts (the key may also
+    be given as "id"), `deletes` a list of ids. Updates sharing a column set go
+    out as one UPDATE ... FROM (VALUES ...) through execute_values, deletions as
+    one DELETE ... WHERE key = ANY(...). Returns the ids touched per action and
+    the ones that matched no row.
+    """
+    if len(updates) + len(deletes) > MAX_BATCH_ROWS:
+        raise ValueError(f"Не больше {MAX_BATCH_ROWS} строк за один запрос")
+    # объект или список из JSON psycopg2 не подставит (dict) или превратит в ARRAY (list)
+    if any(isinstance(row_id, (dict, list)) for row_id in deletes):
+        raise ValueError("Ключи в delete должны быть строками или числами")
+
+    # строки с одинаковым набором столбцов обновляются одним оператором
+    groups = defaultdict(list)
+    for change in updates:
+        change = dict(change)
+        row_id = change.pop(table.key, change.pop('id', None))
+        if row_id is None:
+            raise ValueError(f"У изменения нет ключа {table.key}")
+        nested = [column for column, value in change.items() if isinstance(value, (dict, list))]
+        if isinstance(row_id, (dict, list)) or nested:
+            raise ValueError(f"Значение {', '.join(nested) or table.key} должно быть строкой, числом или null, "
+                             f"а не объектом или списком")
+        unknown = [column for column in change if column not in table.columns]
+        if unknown:
+            raise ValueError(f"Столбцов {', '.join(unknown)} нет в таблице {table.name}")
+        if change:
+            columns = tuple(sorted(change))
+            groups[columns].append([row_id] + [change[column] for column in columns])
+
+    target = sql.Identifier(table.name)
+    key = sql.Identifier(table.key)
+    result = {"updated": [], "deleted": [], "not_found": []}
+    autocommit = connection.autocommit
+    connection.autocommit = False
+    try:
+        with connection.cursor() as cursor:
+            for columns, rows in groups.items():
+                assignments = sql.SQL(', ').join(
+                    sql.SQL("{column} = v.{column}::{type}").format(
+                        column=sql.Identifier(column), type=sql.SQL(table.column_types[column]))
+                    for column in columns)
+                query = sql.SQL("UPDATE {target} t SET {assignments} FROM (VALUES %s) AS v({names}) "
+                                "WHERE t.{key} = v.{key}::{key_type} RETURNING t.{key}").format(
+                    target=target, assignments=assignments, key=key, key_type=_key_cast(table),
+                    names=sql.SQL(', ').join(map(sql.Identifier, (table.key,) + columns)))
+                updated = {row[0] for row in execute_values(cursor, query.as_string(connection), rows,
+                                                          page_size=len(rows), fetch=True)}
+                result["updated"] += sorted(updated)
+                result["not_found"] += [row[0] for row in rows if _as_key(row[0]) not in updated]
+
+            if deletes:
+                cursor.execute(sql.SQL("DELETE FROM {target} WHERE {key} = ANY(%s::{key_type}[]) RETURNING {key}")
+                               .format(target=target, key=key, key_type=_key_cast(table)),
+                               ([str(row_id) for row_id in deletes],))
+                deleted = {row[0] for row in cursor.fetchall()}
+                result["deleted"] = sorted(deleted)
+                result["not_found"] += [row_id for row_id in deletes if _as_key(row_id) not in deleted]
+        connection.commit()
+    except (psycopg2.DataError, psycopg2.IntegrityError) as error:
+        # неверное значение или нарушение ссылки в любой строке отменяет весь пакет
+        connection.rollback()
+        raise ValueError(error.diag.message_primary or str(error)) from error
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.autocommit = autocommit
+    return result
+
+
+def _as_key(value):
+    """Client ids arrive as strings or numbers; SERIAL keys come back as int"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
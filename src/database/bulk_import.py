@@ -0,0 +1,129 @@
+import csv
+import io
+import time
+
+import psycopg2
+from psycopg2 import sql
+
+BATCH_ROWS = 50_000
+
+
+def read_header(stream) -> list:
+    """Parse the CSV header line, leaving the stream at the first data record"""
+    line = stream.readline()
+    if not line.strip():
+        raise ValueError("Пустой CSV: нет строки заголовка")
+    return [column.strip() for column in next(csv.reader([line]))]
+
+
+def iter_batches(stream, batch_rows: int = BATCH_ROWS):
+    """Yield raw CSV text of at most batch_rows records without reading the whole file"""
+    lines, records, in_quotes = [], 0, False
+    for line in stream:
+        lines.append(line)
+        # запись может занимать несколько строк, если в кавычках есть перевод строки
+        if line.count('"') % 2:
+            in_quotes = not in_quotes
+        if in_quotes:
+            continue
+        records += 1
+        if records == batch_rows:
+            yield ''.join(lines)
+            lines, records = [], 0
+    if in_quotes:
+        raise ValueError("CSV оборвался внутри значения в кавычках")
+    if records:
+        yield ''.join(lines)
+
+
+def import_csv(connection, table, stream, upsert: bool = False, batch_rows: int = BATCH_ROWS) -> dict:
+    """Stream CSV text into `table` through COPY into a staging table and one merge.
+
+    `table` is a TableInfo from the schema cache; the header must name a subset
+    of its columns, and with upsert the primary key as well. Everything runs in
+    one transaction, so a bad batch leaves the table untouched.
+    """
+    header = read_header(stream)
+    unknown = [column for column in header if column not in table.columns]
+    if unknown:
+        raise ValueError(f"Столбцов {', '.join(unknown)} нет в таблице {table.name}")
+    if len(set(header)) != len(header):
+        raise ValueError("Столбцы в заголовке повторяются")
+    # ON CONFLICT требует весь первичный ключ (у секционированных таблиц он составной)
+    conflict_columns = table.key_columns or [table.key]
+    if upsert and not set(conflict_columns) <= set(header):
+        raise ValueError(f"Для upsert в заголовке нужен ключ {', '.join(conflict_columns)}")
+
+    columns = sql.SQL(', ').join(map(sql.Identifier, header))
+    target = sql.Identifier(table.name)
+    staging = sql.Identifier(f"staging_{table.name}")
+    report = {"table": table.name, "columns": header, "batches": []}
+
+    autocommit = connection.autocommit
+    connection.autocommit = False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql.SQL("CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                                   "SELECT {columns} FROM {target} WITH NO DATA")
+                           .format(staging=staging, columns=columns, target=target))
+            copy = sql.SQL("COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)").format(
+                staging=staging, columns=columns).as_string(connection)
+
+            for number, chunk in enumerate(iter_batches(stream, batch_rows), start=1):
+                start = time.perf_counter()
+                cursor.copy_expert(copy, io.StringIO(chunk))
+                report["batches"].append({"batch": number, "rows": cursor.rowcount,
+                                          "seconds": round(time.perf_counter() - start, 4)})
+
+            # ключ секционированной таблицы включает дату, и ON CONFLICT сравнивает их вместе: строка с
+            # существующим id и другой датой вставилась бы второй копией. Такие строки отвергаются до слияния
+            # со списком id (реестр partition_keys отверг бы их и сам, но без списка)
+            if len(conflict_columns) > 1 and set(conflict_columns) <= set(header):
+                rest = [column for column in conflict_columns if column != table.key]
+                cursor.execute(sql.SQL("SELECT DISTINCT s.{key} FROM {staging} s JOIN {target} t ON t.{key} = s.{key} "
+                                       "WHERE ({target_rest}) IS DISTINCT FROM ({staging_rest}) "
+                                       "ORDER BY 1 LIMIT 51").format(
+                    key=sql.Identifier(table.key), staging=staging, target=target,
+                    target_rest=sql.SQL(', ').join(sql.Identifier('t', column) for column in rest),
+                    staging_rest=sql.SQL(', ').join(sql.Identifier('s', column) for column in rest)))
+                moved = [row[0] for row in cursor.fetchall()]
+                if moved:
+                    shown = ', '.join(map(str, moved[:50])) + (' и другие' if len(moved) > 50 else '')
+                    raise ValueError(f"{table.key} {shown} уже есть в таблице {table.name} с другим значением "
+                                     f"{', '.join(rest)}: id должен быть уникален во всех секциях")
+
+            merge = sql.SQL("INSERT INTO {target} ({columns}) SELECT {columns} FROM {staging}").format(
+                target=target, columns=columns, staging=staging)
+            if upsert:
+                updates = [column for column in header if column not in conflict_columns]
+                conflict = sql.SQL(', ').join(map(sql.Identifier, conflict_columns))
+                if updates:
+                    merge += sql.SQL(" ON CONFLICT ({key}) DO UPDATE SET {assignments}").format(
+                        key=conflict,
+                        assignments=sql.SQL(', ').join(
+                            sql.SQL("{column} = EXCLUDED.{column}").format(column=sql.Identifier(column))
+                            for column in updates))
+                else:
+                    merge += sql.SQL(" ON CONFLICT ({key}) DO NOTHING").format(key=conflict)
+            start = time.perf_counter()
+            cursor.execute(merge)
+            report["merged"] = {"rows": cursor.rowcount, "seconds": round(time.perf_counter() - start, 4)}
+
+            # явные id не двигают SERIAL-последовательность — подтягиваем её
+            if table.key in header:
+                cursor.execute(sql.SQL("SELECT setval(pg_get_serial_sequence(%s, %s), "
+                                       "GREATEST((SELECT MAX({key}) FROM {target}), 1))")
+                               .format(key=sql.Identifier(table.key), target=target),
+                               (table.name, table.key))
+        connection.commit()
+    except (psycopg2.DataError, psycopg2.IntegrityError) as error:
+        # неверное значение в CSV или нарушение ключа/ссылки — ошибка данных клиента, весь импорт отменяется
+        connection.rollback()
+        raise ValueError(error.diag.message_primary or str(error)) from error
+    except (psycopg2.Error, ValueError):
+        connection.rollback()
+        raise
+    finally:
+        connection.autocommit = autocommit
+    report["rows"] = sum(batch["rows"] for batch in report["batches"])
+    return report
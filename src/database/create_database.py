@@ -192,12 +192,20 @@ def create_indexes(cursor) -> None:
     CREATE INDEX IF NOT EXISTS idx_visits_pet_id ON Visits(pet_id);
     CREATE INDEX IF NOT EXISTS idx_visits_vet_id ON Visits(vet_id);
     CREATE INDEX IF NOT EXISTS idx_visits_date ON Visits(visit_date);
-    CREATE INDEX IF NOT EXISTS idx_visits_clinic_id ON Visits(clinic_id);
+    -- фильтр по клинике с сортировкой по дате; заменяет индекс только по clinic_id
+    CREATE INDEX IF NOT EXISTS idx_visits_clinic_date ON Visits(clinic_id, visit_date);
+    DROP INDEX IF EXISTS idx_visits_clinic_id;
 
     CREATE INDEX IF NOT EXISTS idx_veterinarians_clinic_id ON Veterinarians(clinic_id);
 
     CREATE INDEX IF NOT EXISTS idx_vaccinations_pet_id ON Vaccinations(pet_id);
     CREATE INDEX IF NOT EXISTS idx_vaccinations_date ON Vaccinations(vaccination_date);
+
+    -- триграммы для поиска по подстроке (ILIKE '%...%') на странице таблицы
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    CREATE INDEX IF NOT EXISTS idx_owners_last_name_trgm ON Owners USING gin (last_name gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_owners_phone_trgm ON Owners USING gin (phone gin_trgm_ops);
+    CREATE INDEX IF NOT EXISTS idx_pets_name_trgm ON Pets USING gin (name gin_trgm_ops);
     """)
 
 
@@ -388,4 +396,165 @@ def create_procedurs(cursor) -> None:
         RAISE NOTICE 'Вакцинация % успешно добавлена для питомца ID %', vaccine_name_param, pet_id_param;
     END;
     $$;
-    """)
\ No newline at end of file
+    """)
+
+def create_visit_counter(cursor) -> None:
+    """Replace the COUNT(*) visit trigger with an incrementally maintained per-pet counter"""
+    cursor.execute("""
+    DROP TRIGGER IF EXISTS trg_update_visit_count ON Visits;
+    DROP FUNCTION IF EXISTS update_visit_count();
+
+    CREATE TABLE IF NOT EXISTS pet_visit_counts (
+        pet_id INTEGER PRIMARY KEY REFERENCES Pets(pet_id) ON DELETE CASCADE,
+        visits_count INTEGER NOT NULL DEFAULT 0
+    );
+
+    INSERT INTO pet_visit_counts (pet_id, visits_count)
+    SELECT pet_id, COUNT(*) FROM Visits WHERE pet_id IS NOT NULL GROUP BY pet_id
+    ON CONFLICT (pet_id) DO UPDATE SET visits_count = EXCLUDED.visits_count;
+
+    -- Номер визита питомца проставляется до записи строки: без COUNT(*) и без повторного UPDATE.
+    -- Счётчик здесь только читается под блокировкой строки питомца: BEFORE INSERT срабатывает и для строк
+    -- INSERT ... ON CONFLICT, которые затем станут обновлением или будут пропущены, — их считать нельзя.
+    -- Строки одного питомца из одного многострочного INSERT получают общий номер, как и у прежнего триггера.
+    CREATE OR REPLACE FUNCTION count_inserted_visit() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    DECLARE
+        counted INTEGER;
+    BEGIN
+        -- перенос строки в другую секцию при UPDATE (DELETE + INSERT) — не новый визит, номер сохраняется
+        IF current_setting('clinics.updating_visit', true) = NEW.visit_id::text THEN
+            PERFORM set_config('clinics.updating_visit', '', true);
+            RETURN NEW;
+        END IF;
+        IF NEW.pet_id IS NULL THEN
+            NEW.total_visits_count := 0;
+            RETURN NEW;
+        END IF;
+
+        -- FOR UPDATE: параллельная вставка тому же питомцу ждёт COMMIT и видит новый счётчик. Блокировка не
+        -- создаёт версию строки (в отличие от пустого UPDATE), поэтому тысячи визитов одного питомца в одной
+        -- транзакции не удлиняют цепочку версий, которую пришлось бы проходить на каждой строке
+        SELECT visits_count INTO counted FROM pet_visit_counts WHERE pet_id = NEW.pet_id FOR UPDATE;
+        IF NOT FOUND THEN
+            INSERT INTO pet_visit_counts (pet_id, visits_count) VALUES (NEW.pet_id, 0) ON CONFLICT (pet_id) DO NOTHING;
+            SELECT visits_count INTO counted FROM pet_visit_counts WHERE pet_id = NEW.pet_id FOR UPDATE;
+        END IF;
+        NEW.total_visits_count := counted + 1;
+        RETURN NEW;
+    END;
+    $$;
+
+    CREATE OR REPLACE TRIGGER trg_count_inserted_visit
+    BEFORE INSERT ON Visits
+    FOR EACH ROW
+    EXECUTE FUNCTION count_inserted_visit();
+
+    -- Вставленные визиты: в таблице переходов только действительно вставленные строки,
+    -- без конфликтов ON CONFLICT и без переносов между секциями (они попадают в UPDATE)
+    CREATE OR REPLACE FUNCTION count_inserted_visits() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    BEGIN
+        INSERT INTO pet_visit_counts (pet_id, visits_count)
+        SELECT pet_id, COUNT(*)
+        FROM new_visits
+        WHERE pet_id IS NOT NULL
+        GROUP BY pet_id
+        ORDER BY pet_id
+        ON CONFLICT (pet_id) DO UPDATE SET visits_count = pet_visit_counts.visits_count + EXCLUDED.visits_count;
+        RETURN NULL;
+    END;
+    $$;
+
+    CREATE OR REPLACE TRIGGER trg_count_inserted_visits
+    AFTER INSERT ON Visits
+    REFERENCING NEW TABLE AS new_visits
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION count_inserted_visits();
+
+    -- Удаление визитов: один UPDATE счётчиков на оператор
+    CREATE OR REPLACE FUNCTION count_deleted_visits() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    BEGIN
+        UPDATE pet_visit_counts c
+        SET visits_count = c.visits_count - d.visits
+        FROM (
+            SELECT pet_id, COUNT(*) AS visits
+            FROM old_visits
+            WHERE pet_id IS NOT NULL
+            GROUP BY pet_id
+        ) d
+        WHERE c.pet_id = d.pet_id;
+        RETURN NULL;
+    END;
+    $$;
+
+    CREATE OR REPLACE TRIGGER trg_count_deleted_visits
+    AFTER DELETE ON Visits
+    REFERENCING OLD TABLE AS old_visits
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION count_deleted_visits();
+
+    -- Обновляемая строка запоминается до возможного переноса в другую секцию: BEFORE INSERT, который
+    -- следует за ним, узнаёт её по visit_id. Операторный флаг не годится: операторные триггеры UPDATE
+    -- срабатывают и для INSERT ... ON CONFLICT DO UPDATE, до вставки новых строк.
+    DROP TRIGGER IF EXISTS trg_mark_visits_update ON Visits;
+    DROP FUNCTION IF EXISTS mark_visits_update();
+
+    CREATE OR REPLACE FUNCTION mark_updated_visit() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    BEGIN
+        PERFORM set_config('clinics.updating_visit', NEW.visit_id::text, true);
+        RETURN NEW;
+    END;
+    $$;
+
+    CREATE OR REPLACE TRIGGER trg_mark_updated_visit
+    BEFORE UPDATE ON Visits
+    FOR EACH ROW
+    EXECUTE FUNCTION mark_updated_visit();
+
+    -- Перенос визита на другого питомца: вычитаем у старого, добавляем новому
+    CREATE OR REPLACE FUNCTION count_moved_visits() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    BEGIN
+        PERFORM set_config('clinics.updating_visit', '', true);
+
+        UPDATE pet_visit_counts c
+        SET visits_count = c.visits_count - d.visits
+        FROM (
+            SELECT o.pet_id, COUNT(*) AS visits
+            FROM old_visits o
+            JOIN new_visits n ON n.visit_id = o.visit_id
+            WHERE o.pet_id IS NOT NULL AND o.pet_id IS DISTINCT FROM n.pet_id
+            GROUP BY o.pet_id
+        ) d
+        WHERE c.pet_id = d.pet_id;
+
+        INSERT INTO pet_visit_counts (pet_id, visits_count)
+        SELECT n.pet_id, COUNT(*)
+        FROM new_visits n
+        JOIN old_visits o ON o.visit_id = n.visit_id
+        WHERE n.pet_id IS NOT NULL AND n.pet_id IS DISTINCT FROM o.pet_id
+        GROUP BY n.pet_id
+        ON CONFLICT (pet_id) DO UPDATE SET visits_count = pet_visit_counts.visits_count + EXCLUDED.visits_count;
+        RETURN NULL;
+    END;
+    $$;
+
+    CREATE OR REPLACE TRIGGER trg_count_moved_visits
+    AFTER UPDATE ON Visits
+    REFERENCING OLD TABLE AS old_visits NEW TABLE AS new_visits
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION count_moved_visits();
+    """)
@@ -0,0 +1,74 @@
+import csv
+import io
+from datetime import datetime
+
+from psycopg2 import sql
+
+from database.pagination import iter_named
+
+# столбцы дат для инкрементальной выгрузки (?since=)
+SINCE_COLUMNS = {
+    'visits': 'visit_date',
+    'vaccinations': 'vaccination_date',
+}
+FORMATS = ('csv', 'jsonl')
+EXPORT_ITERSIZE = 5000
+
+
+def parse_since(value: str):
+    """ISO date or timestamp from the since= parameter"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Некорректная дата since: {value}") from None
+
+
+def _source(table, since=None):
+    """SELECT over the table in key order, optionally from `since` onwards"""
+    query = sql.SQL("SELECT * FROM {table}").format(table=sql.Identifier(table.name))
+    params = []
+    if since is not None:
+        if table.name not in SINCE_COLUMNS:
+            raise ValueError(f"Таблица {table.name} не поддерживает since")
+        query += sql.SQL(" WHERE {column} >= %s").format(column=sql.Identifier(SINCE_COLUMNS[table.name]))
+        params.append(since)
+    query += sql.SQL(" ORDER BY {key}").format(key=sql.Identifier(table.key))
+    return query, params
+
+
+def _iter_csv(connection, table, source, params, itersize: int = EXPORT_ITERSIZE):
+    """Yield CSV lines (header first) with values rendered by PostgreSQL, as COPY would"""
+    # ::text даёт то же текстовое представление, что и COPY ... TO STDOUT
+    query = sql.SQL("SELECT {columns} FROM ({source}) t").format(
+        columns=sql.SQL(', ').join(sql.SQL("{}::text").format(sql.Identifier(column)) for column in table.columns),
+        source=source)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def flush() -> str:
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    writer.writerow(table.columns)
+    yield flush()
+    for row in iter_named(connection, query, params, itersize):
+        writer.writerow(row)
+        yield flush()
+
+
+def _iter_jsonl(connection, table, source, params, itersize: int = EXPORT_ITERSIZE):
+    """Yield one JSON object per line, encoded by PostgreSQL"""
+    query = sql.SQL("SELECT row_to_json(t)::text FROM ({source}) t").format(source=source)
+    for (line,) in iter_named(connection, query, params, itersize):
+        yield line + '\n'
+
+
+def iter_export(connection, table, export_format: str = 'csv', since=None):
+    """Lazy text chunks of a table export; bad arguments fail here, before anything is streamed"""
+    if export_format not in FORMATS:
+        raise ValueError(f"Неизвестный формат {export_format}, ожидается один из: {', '.join(FORMATS)}")
+    source, params = _source(table, since)
+    exporter = _iter_csv if export_format == 'csv' else _iter_jsonl
+    return exporter(connection, table, source, params)
@@ -0,0 +1,97 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from psycopg2 import sql
+
+# столбцы поиска по подстроке; под ними триграммные индексы из create_indexes
+SEARCH_COLUMNS = {
+    'owners': ('last_name', 'phone'),
+    'pets': ('name',),
+}
+TEXT_TYPES = ('character varying', 'text', 'character')
+
+# тип столбца из information_schema -> разбор значения фильтра
+_PARSERS = {
+    'integer': int,
+    'smallint': int,
+    'bigint': int,
+    'numeric': Decimal,
+    'date': date.fromisoformat,
+    'timestamp without time zone': datetime.fromisoformat,
+}
+
+
+@dataclass
+class TableView:
+    """Equality filters, substring search and sort order requested for a table page"""
+    filters: dict = field(default_factory=dict)
+    search: str = None
+    search_columns: tuple = ()
+    sort: str = None
+    descending: bool = False
+
+    def conditions(self, sql_module=sql) -> tuple:
+        """WHERE conditions as a list of composables plus their parameters"""
+        conditions, params = [], []
+        for column, value in self.filters.items():
+            conditions.append(sql_module.SQL("{column} = %s").format(column=sql_module.Identifier(column)))
+            params.append(value)
+        if self.search:
+            pattern = '%' + self.search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            matches = [sql_module.SQL("{column} ILIKE %s").format(column=sql_module.Identifier(column))
+                       for column in self.search_columns]
+            conditions.append(sql_module.SQL("({})").format(sql_module.SQL(" OR ").join(matches)))
+            params += [pattern] * len(matches)
+        return conditions, params
+
+    def url_args(self) -> dict:
+        """Query-string arguments that reproduce this view in page links"""
+        args = {'filter': [f"{column}:{value}" for column, value in self.filters.items()]}
+        if self.search:
+            args['search'] = self.search
+        if self.sort:
+            args['sort'] = ('-' if self.descending else '') + self.sort
+        return args
+
+
+def parse_value(table, column: str, value: str):
+    """Filter value converted to the column type, so a typo is a 400 and not a database error"""
+    parser = _PARSERS.get(table.column_types.get(column))
+    if parser is None:
+        return value
+    try:
+        return parser(value)
+    except (ValueError, InvalidOperation):
+        raise ValueError(f"Некорректное значение {value!r} для столбца {column}") from None
+
+
+def parse_view(table, args) -> TableView:
+    """TableView from request args: filter=column:value (repeatable), search=text, sort=[-]column.
+
+    Unknown columns and values that do not fit the column type raise ValueError.
+    """
+    view = TableView(search_columns=SEARCH_COLUMNS.get(table.name) or
+                     tuple(column for column in table.columns if table.column_types.get(column) in TEXT_TYPES))
+    items = args.getlist('filter')
+    # новый фильтр из формы страницы приходит двумя полями
+    if args.get('filter_column'):
+        items.append(f"{args['filter_column']}:{args.get('filter_value', '')}")
+    for item in items:
+        column, separator, value = item.partition(':')
+        if not separator or column not in table.columns:
+            raise ValueError(f"Некорректный фильтр {item!r}: ожидается столбец:значение")
+        view.filters[column] = parse_value(table, column, value)
+
+    view.search = args.get('search', '').strip() or None
+    if view.search and not view.search_columns:
+        raise ValueError(f"В таблице {table.name} нет текстовых столбцов для поиска")
+
+    sort = args.get('sort', '')
+    view.descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort:
+        if sort not in table.columns:
+            raise ValueError(f"Столбца {sort} нет в таблице {table.name}")
+        view.sort = sort
+    return view
@@ -0,0 +1,214 @@
+import io
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from database.partitions import ensure_partitions
+
+# объёмы по умолчанию для пресетов генератора
+SCALES = {
+    'small': dict(clinics=10, vets=100, owners=10_000, pets=10_000, visits=100_000, vaccinations=40_000),
+    'medium': dict(clinics=100, vets=5_000, owners=500_000, pets=500_000, visits=5_000_000, vaccinations=2_000_000),
+    'large': dict(clinics=1_000, vets=50_000, owners=5_000_000, pets=5_000_000, visits=50_000_000,
+                  vaccinations=20_000_000),
+}
+
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков',
+              'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов']
+FIRST_NAMES = ['Александр', 'Екатерина', 'Михаил', 'Ольга', 'Денис', 'Татьяна', 'Артём', 'Юлия', 'Павел', 'Алина',
+               'Игорь', 'Светлана', 'Алексей', 'Анастасия', 'Виктория', 'Елена', 'Юрий', 'Алла']
+SPECIALIZATIONS = (['Терапевт'] * 6 + ['Хирург'] * 2 +
+                   ['Кардиолог', 'Реаниматолог', 'Неврология', 'Офтальмолог', 'Дерматолог'])
+WORKING_HOURS = ['00:00-23:59', '09:00-21:00', '09:00-18:00', '08:00-20:00']
+# вид -> породы; веса видов примерно как в городской клинике
+SPECIES = {
+    'Кошка': ['Британская', 'Дворовая', 'Персидская', 'Мейн-кун', 'Сфинкс', 'Сиамская'],
+    'Собака': ['Лабрадор', 'Овчарка', 'Джек-рассел', 'Хаски', 'Такса', 'Дворовая'],
+    'Кролик': ['Карликовый', 'Вислоухий'],
+    'Хомяк': ['Сирийский', 'Джунгарский'],
+    'Попугай': ['Волнистый', 'Корелла'],
+}
+SPECIES_WEIGHTS = [45, 40, 6, 5, 4]
+DIAGNOSES = ['Гастрит', 'Аллергия', 'Лишай', 'Перелом', 'Конъюнктивит', 'Отит', 'Кариес', 'Травма лапы', 'Диабет',
+             'Чумка', 'Плановый осмотр', 'Дерматит', 'Цистит', 'Ожирение', None]
+TREATMENTS = ['Диета, лекарства', 'Антигистаминные препараты', 'Противогрибковая мазь', 'Гипсовая повязка',
+              'Глазные капли', 'Антибиотики, капли', 'Чистка, пломба', 'Перевязка', 'Инсулинотерапия', None]
+VACCINES = ['Nobivac Tricat', 'Эурикан DHPPI2-LR', 'Purevax RCPCh', 'Вангард 7', 'Фелоцел CVR', 'Нобивак RL',
+            'Раббивак-V', 'Лейкоцел 2', 'Дефенсор 3', 'Мультифел-4']
+# вес дня недели (пн..вс) для времени визита
+WEEKDAY_WEIGHTS = [16, 16, 15, 15, 16, 13, 9]
+
+COPY_BUFFER = 1 << 16
+
+
+class RowStream(io.TextIOBase):
+    """File-like adapter turning an iterator of row tuples into COPY text format"""
+
+    def __init__(self, rows) -> None:
+        self._rows = rows
+        self._buffer = ''
+
+    @staticmethod
+    def _format(row) -> str:
+        return '\t'.join('\\N' if value is None else str(value) for value in row) + '\n'
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        parts, length = [self._buffer], len(self._buffer)
+        for row in self._rows:
+            line = self._format(row)
+            parts.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        data = ''.join(parts)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+class Generator:
+    """Synthetic clinic data with valid foreign keys and skewed, realistic distributions"""
+
+    def __init__(self, counts: dict, offsets: dict, seed: int = 42, years: int = 5) -> None:
+        self.counts = counts
+        self.offsets = offsets
+        self.random = random.Random(seed)
+        self.today = date.today()
+        self.years = years
+
+    def _id(self, table: str, number: int) -> int:
+        return self.offsets[table] + number
+
+    def _day_in_past(self, days: int) -> date:
+        return self.today - timedelta(days=self.random.randrange(days))
+
+    def _clinic_of_vet(self, number: int) -> int:
+        # детерминированная привязка ветеринара к клинике, чтобы визиты ссылались на «его» клинику
+        return self._id('clinics', 1 + number * 7919 % self.counts['clinics'])
+
+    def clinics(self):
+        for number in range(1, self.counts['clinics'] + 1):
+            # уникальные поля строятся от id, чтобы повторный запуск не повторял адреса и телефоны
+            clinic_id = self._id('clinics', number)
+            yield (clinic_id, f"Клиника {clinic_id}", f"г. Зеленоград, корп. {clinic_id}, оф. gen",
+                   f"+7{8_400_000_000 + clinic_id}", f"clinic{clinic_id}.vet", self._day_in_past(365 * 30),
+                   self.random.choice(WORKING_HOURS))
+
+    def veterinarians(self):
+        for number in range(1, self.counts['vets'] + 1):
+            salary = max(30_000, round(self.random.gauss(80_000, 12_000), 2))
+            yield (self._id('veterinarians', number), self.random.choice(LAST_NAMES),
+                   self.random.choice(FIRST_NAMES), self._clinic_of_vet(number),
+                   self.random.choice(SPECIALIZATIONS), salary)
+
+    def owners(self):
+        for number in range(1, self.counts['owners'] + 1):
+            yield (self._id('owners', number), self.random.choice(LAST_NAMES), self.random.choice(FIRST_NAMES),
+                   f"+7{9_500_000_000 + self._id('owners', number)}", f"owner{number}@example.com",
+                   f"г. Зеленоград, корп. {self.random.randrange(100, 2000)}", self._day_in_past(365 * 10))
+
+    def pets(self):
+        species_names = list(SPECIES)
+        for number in range(1, self.counts['pets'] + 1):
+            species = self.random.choices(species_names, SPECIES_WEIGHTS)[0]
+            birth = self._day_in_past(365 * 15)
+            registration = birth + timedelta(days=self.random.randrange((self.today - birth).days + 1))
+            yield (self._id('pets', number), f"Питомец {number}",
+                   self._id('owners', self.random.randrange(1, self.counts['owners'] + 1)),
+                   species, self.random.choice(SPECIES[species]), birth, self.random.choice('MF'), registration)
+
+    def _skewed_pet(self) -> int:
+        # у небольшой доли питомцев — большинство визитов
+        return self._id('pets', 1 + int(self.counts['pets'] * self.random.random() ** 3) % self.counts['pets'])
+
+    def _visit_time(self) -> datetime:
+        while True:
+            day = self.today - timedelta(days=self.random.randrange(-30, 365 * self.years))
+            if self.random.randrange(16) < WEEKDAY_WEIGHTS[day.weekday()]:
+                break
+        return datetime(day.year, day.month, day.day, self.random.randrange(8, 21), self.random.choice((0, 15, 30, 45)))
+
+    def visits(self):
+        now = datetime.now()
+        # будущие записи ветеринара не пересекаются (ограничение visits_vet_no_overlap): получасовая сетка,
+        # повторная запись на занятое время становится отменённой
+        booked = set()
+        for number in range(1, self.counts['visits'] + 1):
+            vet = self.random.randrange(1, self.counts['vets'] + 1)
+            visit_date = self._visit_time()
+            if visit_date > now:
+                visit_date = visit_date.replace(minute=visit_date.minute // 30 * 30)
+                status = 'cancelled' if (vet, visit_date) in booked else 'scheduled'
+                booked.add((vet, visit_date))
+            else:
+                status = 'cancelled' if self.random.random() < 0.05 else 'completed'
+            cost = round(min(50_000.0, self.random.lognormvariate(7.8, 0.5)), 2)
+            yield (self._id('visits', number), visit_date, self._skewed_pet(), self._id('veterinarians', vet),
+                   self._clinic_of_vet(vet), self.random.choice(DIAGNOSES), self.random.choice(TREATMENTS),
+                   cost, status)
+
+    def vaccinations(self):
+        for number in range(1, self.counts['vaccinations'] + 1):
+            vet = self.random.randrange(1, self.counts['vets'] + 1)
+            vaccination_date = self._day_in_past(365 * self.years)
+            yield (self._id('vaccinations', number), self.random.choice(VACCINES),
+                   self._id('pets', self.random.randrange(1, self.counts['pets'] + 1)),
+                   self._id('veterinarians', vet), vaccination_date, vaccination_date + timedelta(days=365),
+                   self._clinic_of_vet(vet))
+
+
+# таблица (она же метод генератора) -> (ключ, столбцы COPY, имя объёма в counts)
+LAYOUT = {
+    'clinics': ('clinic_id', 'clinic_id, name, address, phone, website, opening_date, working_hours', 'clinics'),
+    'veterinarians': ('vet_id', 'vet_id, last_name, first_name, clinic_id, specialization, salary', 'vets'),
+    'owners': ('owner_id', 'owner_id, last_name, first_name, phone, email, address, registration_date', 'owners'),
+    'pets': ('pet_id', 'pet_id, name, owner_id, species, breed, birth_date, gender, registration_date', 'pets'),
+    'visits': ('visit_id', 'visit_id, visit_date, pet_id, vet_id, clinic_id, diagnosis, treatment, cost, status',
+               'visits'),
+    'vaccinations': ('vaccination_id', 'vaccination_id, vaccine_name, pet_id, vet_id, vaccination_date, '
+                                       'next_vaccination_date, clinic_id', 'vaccinations'),
+}
+
+
+def generate(connection, counts: dict, seed: int = 42, log=print) -> dict:
+    """COPY synthetic rows into every table after the existing ids, one transaction per table"""
+    autocommit = connection.autocommit
+    connection.autocommit = False
+    timings = {}
+    try:
+        with connection.cursor() as cursor:
+            offsets = {}
+            for table, (key, _, _) in LAYOUT.items():
+                cursor.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {table}")
+                offsets[table] = cursor.fetchone()[0]
+            generator = Generator(counts, offsets, seed=seed)
+            # месячные секции на весь период заранее, иначе строки осели бы в DEFAULT
+            first_day = generator.today - timedelta(days=365 * generator.years)
+            ensure_partitions(cursor, 'visits', first_day, generator.today + timedelta(days=30))
+            ensure_partitions(cursor, 'vaccinations', first_day, generator.today)
+            connection.commit()
+
+            for table, (key, columns, count_name) in LAYOUT.items():
+                start = time.perf_counter()
+                rows = getattr(generator, table)()
+                cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", RowStream(rows), size=COPY_BUFFER)
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', '{key}'), "
+                               f"GREATEST((SELECT MAX({key}) FROM {table}), 1))")
+                connection.commit()
+                timings[table] = round(time.perf_counter() - start, 2)
+                log(f"{table}: {counts[count_name]} строк за {timings[table]} с")
+
+            connection.autocommit = True
+            for table in LAYOUT:
+                cursor.execute(f"ANALYZE {table}")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.autocommit = autocommit
+    return timings
@@ -0,0 +1,120 @@
+def create_pet_history(cursor) -> None:
+    """Per-pet history version bumped by statement triggers on Visits and Vaccinations"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS pet_history_versions (
+        pet_id INTEGER PRIMARY KEY REFERENCES Pets(pet_id) ON DELETE CASCADE,
+        version BIGINT NOT NULL DEFAULT 0
+    );
+
+    -- Одно обновление версии на питомца за оператор; новые версии берутся по порядку pet_id,
+    -- чтобы параллельные операторы над одними питомцами не взаимоблокировались.
+    -- Ветки с чужой таблицей переходов не выполняются и не планируются.
+    CREATE OR REPLACE FUNCTION bump_pet_history() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO pet_history_versions AS h (pet_id, version)
+            SELECT DISTINCT n.pet_id, 1 FROM new_rows n JOIN Pets p ON p.pet_id = n.pet_id
+            ORDER BY n.pet_id
+            ON CONFLICT (pet_id) DO UPDATE SET version = h.version + 1;
+        ELSIF TG_OP = 'DELETE' THEN
+            -- при удалении питомца каскадом его строки уже не нужны: JOIN отбрасывает их
+            INSERT INTO pet_history_versions AS h (pet_id, version)
+            SELECT DISTINCT o.pet_id, 1 FROM old_rows o JOIN Pets p ON p.pet_id = o.pet_id
+            ORDER BY o.pet_id
+            ON CONFLICT (pet_id) DO UPDATE SET version = h.version + 1;
+        ELSE
+            INSERT INTO pet_history_versions AS h (pet_id, version)
+            SELECT changed.pet_id, 1
+            FROM (SELECT pet_id FROM old_rows UNION SELECT pet_id FROM new_rows) changed
+            JOIN Pets p ON p.pet_id = changed.pet_id
+            ORDER BY changed.pet_id
+            ON CONFLICT (pet_id) DO UPDATE SET version = h.version + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+
+    -- таблицы переходов допускаются только у триггера на одно событие
+    CREATE OR REPLACE TRIGGER trg_visits_history_insert
+    AFTER INSERT ON Visits REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_pet_history();
+    CREATE OR REPLACE TRIGGER trg_visits_history_update
+    AFTER UPDATE ON Visits REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_pet_history();
+    CREATE OR REPLACE TRIGGER trg_visits_history_delete
+    AFTER DELETE ON Visits REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_pet_history();
+
+    CREATE OR REPLACE TRIGGER trg_vaccinations_history_insert
+    AFTER INSERT ON Vaccinations REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_pet_history();
+    CREATE OR REPLACE TRIGGER trg_vaccinations_history_update
+    AFTER UPDATE ON Vaccinations REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_pet_history();
+    CREATE OR REPLACE TRIGGER trg_vaccinations_history_delete
+    AFTER DELETE ON Vaccinations REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_pet_history();
+    """)
+
+
+# Визиты и вакцинации собираются отдельными подзапросами по индексам pet_id: размер ответа равен сумме записей
+# питомца, а не их произведению, как в представлении pet_history. Версия читается тем же снимком.
+HISTORY_QUERY = """
+    SELECT COALESCE(h.version, 0), json_build_object(
+        'pet_id', p.pet_id,
+        'visits', COALESCE((
+            SELECT json_agg(json_build_object(
+                'visit_id', v.visit_id, 'visit_date', v.visit_date, 'vet_id', v.vet_id, 'clinic_id', v.clinic_id,
+                'status', v.status, 'diagnosis', v.diagnosis, 'treatment', v.treatment, 'cost', v.cost
+            ) ORDER BY v.visit_date, v.visit_id)
+            FROM Visits v WHERE v.pet_id = p.pet_id), '[]'),
+        'vaccinations', COALESCE((
+            SELECT json_agg(json_build_object(
+                'vaccination_id', va.vaccination_id, 'vaccine_name', va.vaccine_name, 'vet_id', va.vet_id,
+                'clinic_id', va.clinic_id, 'vaccination_date', va.vaccination_date,
+                'next_vaccination_date', va.next_vaccination_date
+            ) ORDER BY va.vaccination_date, va.vaccination_id)
+            FROM Vaccinations va WHERE va.pet_id = p.pet_id), '[]')
+    )::text
+    FROM Pets p
+    LEFT JOIN pet_history_versions h ON h.pet_id = p.pet_id
+    WHERE p.pet_id = %s
+"""
+
+VERSION_QUERY = """
+    SELECT COALESCE(h.version, 0)
+    FROM Pets p
+    LEFT JOIN pet_history_versions h ON h.pet_id = p.pet_id
+    WHERE p.pet_id = %s
+"""
+
+
+def pet_history(connection, pet_id: int, cache):
+    """JSON text {"pet_id", "visits": [...], "vaccinations": [...]} of one pet, None if there is no such pet.
+
+    `cache` (database.cache.TTLCache) keeps (version, body) per pet; a cached
+    body is served after a primary-key lookup of the pet's version, so any
+    change to its visits or vaccinations is seen on the next request.
+    """
+    cached = cache.get(pet_id) if cache.ttl > 0 else None
+    with connection.cursor() as cursor:
+        if cached is not None:
+            cursor.execute(VERSION_QUERY, (pet_id,))
+            row = cursor.fetchone()
+            if row is None:
+                cache.invalidate(pet_id)
+                return None
+            if row[0] == cached[0]:
+                return cached[1]
+        cursor.execute(HISTORY_QUERY, (pet_id,))
+        row = cursor.fetchone()
+    if row is None:
+        cache.invalidate(pet_id)
+        return None
+    version, body = row
+    if cache.ttl > 0:
+        cache.set(pet_id, (version, body))
+    return body
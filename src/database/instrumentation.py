@@ -0,0 +1,175 @@
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger('database.slow_queries')
+
+# маршрут Flask, от имени которого выполняются запросы текущего потока/задачи
+current_route = contextvars.ContextVar('current_route', default='-')
+
+# поле ConnectionPool.stats() -> (имя метрики, тип)
+POOL_METRICS = {
+    'min': ('clinics_pool_min_connections', 'gauge'),
+    'max': ('clinics_pool_max_connections', 'gauge'),
+    'in_use': ('clinics_pool_connections_in_use', 'gauge'),
+    'checkouts': ('clinics_pool_checkouts_total', 'counter'),
+    'timeouts': ('clinics_pool_timeouts_total', 'counter'),
+    'wait_seconds': ('clinics_pool_wait_seconds_total', 'counter'),
+}
+
+# операторы, план которых показывает EXPLAIN без выполнения (по первому слову запроса)
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, one series per label value"""
+
+    def __init__(self, buckets=BUCKETS) -> None:
+        self.buckets = buckets
+        self._counts = defaultdict(lambda: [0] * len(self.buckets))
+        self._sums = defaultdict(float)
+        self._totals = defaultdict(int)
+
+    def observe(self, label, value: float) -> None:
+        counts = self._counts[label]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        self._sums[label] += value
+        self._totals[label] += 1
+
+    def render(self, name: str, label_name: str) -> list:
+        lines = [f"# TYPE {name} histogram"]
+        for label, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label_name}="{label}",le="+Inf"}} {self._totals[label]}')
+            lines.append(f'{name}_sum{{{label_name}="{label}"}} {self._sums[label]:.6f}')
+            lines.append(f'{name}_count{{{label_name}="{label}"}} {self._totals[label]}')
+        return lines
+
+
+class Metrics:
+    """Process-wide query and request statistics"""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.slow_query_seconds = 0.2
+        self.explain_slow = False
+        self._lock = threading.Lock()
+        self.queries = Histogram()
+        self.requests = Histogram()
+        self.rows = defaultdict(int)
+        self.slow = defaultdict(int)
+
+    def configure(self, enabled: bool, slow_query_ms: float = 200, explain_slow: bool = False) -> None:
+        self.enabled = enabled
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.explain_slow = explain_slow
+
+    def observe_query(self, route: str, seconds: float, rows: int) -> None:
+        with self._lock:
+            self.queries.observe(route, seconds)
+            if rows > 0:
+                self.rows[route] += rows
+            if seconds >= self.slow_query_seconds:
+                self.slow[route] += 1
+
+    def observe_request(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self.requests.observe(endpoint, seconds)
+
+    def render(self, pool_stats: dict) -> str:
+        with self._lock:
+            lines = self.requests.render('clinics_request_duration_seconds', 'endpoint')
+            lines += self.queries.render('clinics_query_duration_seconds', 'route')
+            lines.append("# TYPE clinics_query_rows_total counter")
+            lines += [f'clinics_query_rows_total{{route="{route}"}} {rows}' for route, rows in sorted(self.rows.items())]
+            lines.append("# TYPE clinics_slow_queries_total counter")
+            lines += [f'clinics_slow_queries_total{{route="{route}"}} {count}'
+                      for route, count in sorted(self.slow.items())]
+        for key, value in pool_stats.items():
+            name, kind = POOL_METRICS[key]
+            lines += [f"# TYPE {name} {kind}", f"{name} {value}"]
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class InstrumentedCursor(extensions.cursor):
+    """Cursor recording timing and row counts of every statement into `metrics`.
+
+    Only installed as cursor_factory when metrics are enabled, so a disabled
+    setup runs on the plain psycopg2 cursor with no overhead at all.
+    """
+
+    def _record(self, query, params, start: float, rows: int = None) -> None:
+        seconds = time.perf_counter() - start
+        route = current_route.get()
+        rows = self.rowcount if rows is None else rows
+        metrics.observe_query(route, seconds, rows)
+        if seconds >= metrics.slow_query_seconds:
+            self._log_slow(route, query, params, seconds, rows)
+
+    def record_fetched(self, query, params, start: float, rows: int) -> None:
+        """Record a server-side cursor query once its rows have been read, see pagination.iter_named"""
+        self._record(query, params, start, rows)
+
+    def _log_slow(self, route: str, query, params, seconds: float, rows: int) -> None:
+        try:
+            text = self.mogrify(query, params).decode(self.connection.encoding, 'replace')
+        except (psycopg2.Error, TypeError, ValueError):
+            text = str(query)
+        plan = None
+        # Только план, без ANALYZE: ANALYZE выполнил бы оператор второй раз, а «SELECT» не значит «только
+        # чтение» — SELECT pg_advisory_lock(...) или nextval(...) повторились бы. Вне начатой транзакции:
+        # ошибка EXPLAIN не должна обрывать транзакцию вызывающего кода
+        keyword = text.split(None, 1)[0].upper() if text.strip() else ''
+        if (metrics.explain_slow and self.name is None and keyword in EXPLAINABLE
+                and self.connection.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE):
+            try:
+                with self.connection.cursor(cursor_factory=extensions.cursor) as explain:
+                    explain.execute("EXPLAIN " + text)
+                    plan = '\n'.join(line for (line,) in explain.fetchall())
+            except psycopg2.Error:
+                plan = None
+            finally:
+                # без autocommit EXPLAIN открыл транзакцию — закрываем, соединение остаётся как было
+                if not self.connection.autocommit:
+                    self.connection.rollback()
+        logger.warning("Медленный запрос %.1f мс (маршрут %s, строк %s): %s%s", seconds * 1000, route,
+                       rows, text, f"\n{plan}" if plan else "")
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            # у именованного курсора execute лишь объявляет курсор, строки приходят позже через FETCH
+            if self.name is None:
+                self._record(query, vars, start)
+
+    def executemany(self, query, vars_list):
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, None, start)
+
+    def copy_expert(self, sql, file, size=8192):
+        start = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self._record(sql, None, start)
@@ -0,0 +1,94 @@
+from psycopg2 import errors
+
+from database.create_database import (create_all_tables, create_trigger, create_indexes, create_procedurs,
+                                      create_visit_counter)
+from database.history import create_pet_history
+from database.partitions import create_partitioning
+from database.reminders import create_reminders
+from database.reports import create_report_views
+from database.scheduling import create_boundary_overlap_check, create_visit_schedule
+from database.versions import create_table_versions
+
+# ключ advisory-блокировки, чтобы миграции не запускали сразу несколько воркеров
+MIGRATION_LOCK_ID = 7_311_001
+
+# упорядоченные шаги миграций: (версия, название, функция от курсора)
+MIGRATIONS = [
+    (1, 'create_all_tables', create_all_tables),
+    (2, 'create_trigger', create_trigger),
+    (3, 'create_indexes', create_indexes),
+    (4, 'create_procedurs', create_procedurs),
+    (5, 'create_visit_counter', create_visit_counter),
+    (6, 'create_report_views', create_report_views),
+    (7, 'create_visit_schedule', create_visit_schedule),
+    (8, 'create_partitioning', create_partitioning),
+    (9, 'create_reminders', create_reminders),
+    (10, 'create_pet_history', create_pet_history),
+    (11, 'create_table_versions', create_table_versions),
+    (12, 'create_boundary_overlap_check', create_boundary_overlap_check),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# таблицы, которые ведут сами миграции и не относятся к данным клиник
+SERVICE_TABLES = ('schema_version', 'pet_visit_counts', 'reminder_log', 'pet_history_versions',
+                  'table_versions', 'partition_keys')
+
+
+def current_version(cursor) -> int:
+    """Applied schema version, 0 for a database that was never migrated"""
+    try:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    except errors.UndefinedTable:
+        cursor.connection.rollback()
+        return 0
+    return cursor.fetchone()[0]
+
+
+def _create_version_table(cursor) -> None:
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+
+def migrate(connection) -> list:
+    """Bring the database up to LATEST_VERSION, return the names of applied steps.
+
+    An up-to-date database costs one SELECT; DDL only runs for pending steps,
+    each in its own transaction together with its schema_version row.
+    """
+    with connection.cursor() as cursor:
+        if current_version(cursor) >= LATEST_VERSION:
+            return []
+
+    autocommit = connection.autocommit
+    connection.autocommit = True
+    applied = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            _create_version_table(cursor)
+            # пока ждали блокировку, миграции мог применить другой воркер
+            version = current_version(cursor)
+            connection.autocommit = False
+            for step_version, name, step in MIGRATIONS:
+                if step_version <= version:
+                    continue
+                try:
+                    step(cursor)
+                    cursor.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                                   (step_version, name))
+                    connection.commit()
+                except Exception:
+                    # и ошибки самих шагов (проверки данных перед DDL), иначе транзакция осталась бы открытой
+                    connection.rollback()
+                    raise
+                applied.append(name)
+        finally:
+            connection.autocommit = True
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            connection.autocommit = autocommit
+    return applied
@@ -0,0 +1,166 @@
+import time
+import uuid
+from itertools import islice
+
+from psycopg2 import sql
+
+
+def iter_named(connection, query, params=None, itersize: int = 500):
+    """Yield rows of a query through a named server-side cursor, itersize rows per round trip"""
+    # DECLARE CURSOR работает только внутри транзакции
+    autocommit = connection.autocommit
+    connection.autocommit = False
+    try:
+        with connection.cursor(name=f"cursor_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = itersize
+            start, rows = time.perf_counter(), 0
+            try:
+                cursor.execute(query, params)
+                for row in cursor:
+                    rows += 1
+                    yield row
+            finally:
+                # запрос длится до последнего FETCH: InstrumentedCursor учитывает его время и число строк здесь
+                if hasattr(cursor, 'record_fetched'):
+                    cursor.record_fetched(query, params, start, rows)
+    finally:
+        if not connection.closed:
+            connection.rollback()
+            connection.autocommit = autocommit
+
+
+def page_query(table_name: str, key: str, after=None, before=None, limit: int = 50, sql_module=sql, view=None):
+    """Keyset page SELECT of limit + 1 rows and its parameters.
+
+    The extra row only tells the caller whether another page exists in the
+    direction of travel. With `before` the rows come in reverse display order.
+    `view` (database.filters.TableView) adds filters, search and a sort
+    column; when it sorts by a column other than the key, `after`/`before`
+    are (value, key) pairs and NULL values go last.
+    `sql_module` is psycopg2.sql or the API-compatible psycopg.sql.
+    """
+    query = sql_module.SQL("SELECT * FROM {table}").format(table=sql_module.Identifier(table_name))
+    key_identifier = sql_module.Identifier(key)
+    conditions, params = view.conditions(sql_module) if view is not None else ([], [])
+    sort = view.sort if view is not None and view.sort != key else None
+    backward = before is not None
+    cursor = before if backward else after
+    # обратный проход читает строки в противоположном порядке, Page потом их разворачивает
+    reverse = (view is not None and view.descending) != backward
+    operator = sql_module.SQL('<' if reverse else '>')
+    direction = sql_module.SQL('DESC' if reverse else 'ASC')
+
+    if sort is None:
+        if cursor is not None:
+            conditions.append(sql_module.SQL("{key} {op} %s").format(key=key_identifier, op=operator))
+            params.append(cursor)
+        order = sql_module.SQL("{key} {direction}").format(key=key_identifier, direction=direction)
+    else:
+        column = sql_module.Identifier(sort)
+        names = dict(column=column, key=key_identifier, op=operator)
+        if cursor is not None:
+            value, row_key = cursor
+            if value is None:
+                template = ("({column} IS NOT NULL OR {key} {op} %s)" if backward
+                            else "{column} IS NULL AND {key} {op} %s")
+                params.append(row_key)
+            else:
+                # сравнение кортежей (значение, ключ) и NULL-строки после всех остальных
+                template = ("({column}, {key}) {op} (%s, %s)" if backward
+                            else "(({column}, {key}) {op} (%s, %s) OR {column} IS NULL)")
+                params += [value, row_key]
+            conditions.append(sql_module.SQL(template).format(**names))
+        order = sql_module.SQL("{column} {direction} {nulls}, {key} {direction}").format(
+            column=column, key=key_identifier, direction=direction,
+            nulls=sql_module.SQL('NULLS FIRST' if backward else 'NULLS LAST'))
+
+    if conditions:
+        query += sql_module.SQL(" WHERE ") + sql_module.SQL(" AND ").join(conditions)
+    query += sql_module.SQL(" ORDER BY {order} LIMIT %s").format(order=order)
+    params.append(limit + 1)
+    return query, params
+
+
+def iter_page(connection, table_name: str, key: str, after=None, before=None, limit: int = 50,
+              itersize: int = 500, view=None):
+    """Yield up to limit + 1 rows of a keyset page through a named server-side cursor"""
+    query, params = page_query(table_name, key, after=after, before=before, limit=limit, view=view)
+    yield from iter_named(connection, query, params, itersize)
+
+
+class Page:
+    """Keyset page consumed lazily; prev/next become known once it has been iterated.
+
+    With `sort_index` the page is ordered by another column first, and
+    prev_value/next_value carry that column's value at the boundaries.
+    """
+
+    def __init__(self, rows, limit: int, after=None, before=None, key_index: int = 0, sort_index=None) -> None:
+        self._rows = rows
+        self.limit = limit
+        self.after = after
+        self.before = before
+        self.key_index = key_index
+        self.sort_index = sort_index
+        self._first = self._last = None
+        self._first_row = self._last_row = None
+        self._has_more = False
+
+    def __iter__(self):
+        try:
+            if self.before is not None:
+                # страница назад читается в обратном порядке — её приходится развернуть целиком
+                rows = list(islice(self._rows, self.limit + 1))
+                self._has_more = len(rows) > self.limit
+                rows = rows[:self.limit][::-1]
+            else:
+                rows = self._rows
+            for count, row in enumerate(rows):
+                if count == self.limit:
+                    self._has_more = True
+                    break
+                if self._first is None:
+                    self._first, self._first_row = row[self.key_index], row
+                self._last, self._last_row = row[self.key_index], row
+                yield row
+        finally:
+            if hasattr(self._rows, "close"):
+                self._rows.close()
+
+    @property
+    def prev(self):
+        has_prev = self._has_more if self.before is not None else self.after is not None
+        return self._first if has_prev else None
+
+    @property
+    def next(self):
+        has_next = True if self.before is not None else self._has_more
+        return self._last if has_next else None
+
+    def _value(self, row):
+        return row[self.sort_index] if row is not None and self.sort_index is not None else None
+
+    @property
+    def prev_value(self):
+        return self._value(self._first_row) if self.prev is not None else None
+
+    @property
+    def next_value(self):
+        return self._value(self._last_row) if self.next is not None else None
+
+
+def open_page(connection, table_name: str, key: str, after=None, before=None, limit: int = 50,
+              key_index: int = 0, view=None, sort_index=None) -> Page:
+    """Page over a live server-side cursor, suitable for streaming into a template"""
+    rows = iter_page(connection, table_name, key, after=after, before=before, limit=limit, view=view)
+    return Page(rows, limit, after=after, before=before, key_index=key_index, sort_index=sort_index)
+
+
+def fetch_page(connection, table_name: str, key: str, after=None, before=None, limit: int = 50,
+               key_index: int = 0, view=None, sort_index=None) -> dict:
+    """Read one keyset page and work out the neighbouring page boundaries"""
+    page = open_page(connection, table_name, key, after=after, before=before, limit=limit, key_index=key_index,
+                     view=view, sort_index=sort_index)
+    rows = list(page)
+    return {"rows": rows, "prev": page.prev, "next": page.next,
+            "prev_value": page.prev_value, "next_value": page.next_value}
@@ -0,0 +1,384 @@
+import logging
+import threading
+from datetime import date
+
+import psycopg2
+from psycopg2 import sql
+
+from database.create_database import create_trigger, create_indexes, create_visit_counter
+from database.instrumentation import current_route
+from database.pool import PoolTimeoutError
+from database.reports import REPORTS, create_report_views
+from database.scheduling import add_overlap_constraint
+from database.versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+# таблица -> столбец, по месяцам которого она секционирована
+PARTITIONED = {
+    'visits': 'visit_date',
+    'vaccinations': 'vaccination_date',
+}
+# что добавляется к каждой новой секции помимо унаследованного от родителя
+PARTITION_HOOKS = {
+    'visits': [add_overlap_constraint],
+}
+# на сколько месяцев вперёд держать готовые секции
+MONTHS_AHEAD = 3
+# схема, куда уходят отключённые секции при архивации
+ARCHIVE_SCHEMA = 'archive'
+# самая долгая действующая вакцина; ограничение позволяет отсекать старые секции в напоминаниях
+MAX_VACCINE_VALIDITY = '3 years'
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month:%Y_%m}"
+
+
+def create_partition(cursor, table: str, month: date) -> bool:
+    """Attach the partition for one month unless it exists, return whether it was created.
+
+    Rows of that month that already landed in the DEFAULT partition are moved
+    into the new partition before it is attached.
+    """
+    name = partition_name(table, month)
+    # секция ищется там же, где её создаст CREATE TABLE, а не по всему search_path
+    cursor.execute("SELECT to_regclass(format('%%I.%%I', current_schema(), %s))", (name,))
+    if cursor.fetchone()[0] is not None:
+        return False
+    parent, partition = sql.Identifier(table), sql.Identifier(name)
+    column = sql.Identifier(PARTITIONED[table])
+    bounds = (month, add_months(month, 1))
+    cursor.execute(sql.SQL("CREATE TABLE {partition} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+                   .format(partition=partition, parent=parent))
+    # DELETE из секции напрямую не запускает операторные триггеры родителя — счётчики визитов не меняются
+    cursor.execute(sql.SQL("WITH moved AS (DELETE FROM {default} WHERE {column} >= %s AND {column} < %s "
+                           "RETURNING *) INSERT INTO {partition} SELECT * FROM moved")
+                   .format(default=sql.Identifier(f"{table}_default"), column=column, partition=partition), bounds)
+    cursor.execute(sql.SQL("ALTER TABLE {parent} ATTACH PARTITION {partition} FOR VALUES FROM (%s) TO (%s)")
+                   .format(parent=parent, partition=partition), bounds)
+    for hook in PARTITION_HOOKS.get(table, ()):
+        hook(cursor, name)
+    return True
+
+
+def ensure_partitions(cursor, table: str, start: date, end: date) -> list:
+    """Monthly partitions covering [start, end], returns the names of the new ones"""
+    created = []
+    month = month_start(start)
+    while month <= end:
+        if create_partition(cursor, table, month):
+            created.append(partition_name(table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def _dependent_views(cursor, table: str) -> list:
+    """(name, relkind, definition) of views and materialized views that read the table"""
+    cursor.execute("""
+        SELECT DISTINCT v.oid::regclass::text, v.relkind, pg_get_viewdef(v.oid)
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        JOIN pg_class v ON v.oid = r.ev_class
+        WHERE d.classid = 'pg_rewrite'::regclass
+          AND d.refobjid = to_regclass(%s)
+          AND v.oid <> d.refobjid""", (table,))
+    return cursor.fetchall()
+
+
+def _track_keys(cursor, table: str, key: str) -> None:
+    """Keep `key` unique across all partitions of `table` through the partition_keys registry"""
+    # Первичный ключ секционированной таблицы включает дату, и уникальность id он больше не гарантирует.
+    # Глобального уникального индекса в PostgreSQL нет: его роль играет partition_keys. Операторные триггеры
+    # с таблицами переходов пишут туда только действительно вставленные, удалённые и сменившие id строки;
+    # перенос между секциями и обновление по ON CONFLICT оставляют id на месте и реестр не трогают.
+    cursor.execute(sql.SQL("""
+    CREATE TABLE IF NOT EXISTS partition_keys (
+        table_name VARCHAR(63) NOT NULL,
+        key_value INTEGER NOT NULL,
+        PRIMARY KEY (table_name, key_value)
+    );
+
+    CREATE OR REPLACE FUNCTION {function}() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    DECLARE
+        detail TEXT;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO partition_keys (table_name, key_value) SELECT TG_TABLE_NAME, {key} FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            DELETE FROM partition_keys k USING old_rows o
+            WHERE k.table_name = TG_TABLE_NAME AND k.key_value = o.{key};
+        ELSE
+            -- EXCEPT ALL: две строки, получившие один новый id, дают две вставки и ошибку
+            DELETE FROM partition_keys k
+            USING (SELECT {key} FROM old_rows EXCEPT ALL SELECT {key} FROM new_rows) o
+            WHERE k.table_name = TG_TABLE_NAME AND k.key_value = o.{key};
+            INSERT INTO partition_keys (table_name, key_value)
+            SELECT TG_TABLE_NAME, {key} FROM (SELECT {key} FROM new_rows EXCEPT ALL SELECT {key} FROM old_rows) n;
+        END IF;
+        RETURN NULL;
+    EXCEPTION
+        WHEN unique_violation THEN
+            GET STACKED DIAGNOSTICS detail = PG_EXCEPTION_DETAIL;
+            RAISE EXCEPTION 'Значение % уже есть в таблице %', {key_name}, TG_TABLE_NAME
+                USING ERRCODE = 'unique_violation', DETAIL = detail;
+    END;
+    $$;
+
+    CREATE OR REPLACE TRIGGER {insert_trigger}
+    AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+    CREATE OR REPLACE TRIGGER {update_trigger}
+    AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+    CREATE OR REPLACE TRIGGER {delete_trigger}
+    AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+    """).format(table=sql.Identifier(table), key=sql.Identifier(key), key_name=sql.Literal(key),
+                function=sql.Identifier(f"track_{table}_keys"),
+                insert_trigger=sql.Identifier(f"trg_{table}_keys_insert"),
+                update_trigger=sql.Identifier(f"trg_{table}_keys_update"),
+                delete_trigger=sql.Identifier(f"trg_{table}_keys_delete")))
+
+
+def _partition_table(cursor, table: str, column: str) -> None:
+    """Swap a plain table for a partitioned one with the same columns, constraints, sequence and rows"""
+    cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,))
+    if cursor.fetchone() is not None:
+        return
+    old = f"{table}_unpartitioned"
+    names = dict(table=sql.Identifier(table), old=sql.Identifier(old), column=sql.Identifier(column),
+                 default=sql.Identifier(f"{table}_default"))
+
+    cursor.execute("""
+        SELECT c.conname, a.attname
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        WHERE c.conrelid = to_regclass(%s) AND c.contype = 'p'""", (table,))
+    primary_key, key = cursor.fetchone()
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", (table, key))
+    sequence = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'f'""", (table,))
+    foreign_keys = cursor.fetchall()
+
+    # представления (например, pet_history из test_query.sql) держат ссылку на исходную таблицу и не дали бы
+    # её удалить: обычные пересоздаются по тому же тексту поверх новой таблицы, материализованные — руками
+    views = _dependent_views(cursor, table)
+    materialized = [name for name, kind, _ in views if kind == 'm']
+    if materialized:
+        raise RuntimeError(f"Секционирование {table}: удалите материализованные представления "
+                           f"{', '.join(materialized)} и создайте их заново после миграции")
+    for name, _, _ in views:
+        cursor.execute(sql.SQL("DROP VIEW {view}").format(view=sql.SQL(name)))
+
+    # имя индекса первичного ключа освобождается для новой таблицы
+    cursor.execute(sql.SQL("ALTER TABLE {table} RENAME TO {old}").format(**names))
+    cursor.execute(sql.SQL("ALTER TABLE {old} RENAME CONSTRAINT {primary_key} TO {renamed}").format(
+        primary_key=sql.Identifier(primary_key), renamed=sql.Identifier(f"{old}_pkey"), **names))
+    cursor.execute(sql.SQL("CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+                           "PARTITION BY RANGE ({column})").format(**names))
+    # ключ секционированной таблицы обязан включать столбец секционирования
+    cursor.execute(sql.SQL("ALTER TABLE {table} ADD PRIMARY KEY ({key}, {column})").format(
+        key=sql.Identifier(key), **names))
+    for name, definition in foreign_keys:
+        cursor.execute(sql.SQL("ALTER TABLE {table} ADD CONSTRAINT {name} {definition}").format(
+            name=sql.Identifier(name), definition=sql.SQL(definition), **names))
+    if sequence is not None:
+        cursor.execute(sql.SQL("ALTER SEQUENCE {sequence} OWNED BY {table}.{key}").format(
+            sequence=sql.SQL(sequence), key=sql.Identifier(key), **names))
+
+    cursor.execute(sql.SQL("CREATE TABLE {default} PARTITION OF {table} DEFAULT").format(**names))
+    for hook in PARTITION_HOOKS.get(table, ()):
+        hook(cursor, f"{table}_default")
+    cursor.execute(sql.SQL("SELECT MIN({column})::date FROM {old}").format(**names))
+    first = cursor.fetchone()[0] or date.today()
+    ensure_partitions(cursor, table, first, add_months(month_start(date.today()), MONTHS_AHEAD))
+
+    # реестр ключей заполняется триггерами при переносе строк
+    _track_keys(cursor, table, key)
+    cursor.execute(sql.SQL("INSERT INTO {table} SELECT * FROM {old}").format(**names))
+    cursor.execute(sql.SQL("DROP TABLE {old}").format(**names))
+    for name, _, definition in views:
+        cursor.execute(sql.SQL("CREATE VIEW {view} AS {definition}").format(
+            view=sql.SQL(name), definition=sql.SQL(definition)))
+
+
+def create_partitioning(cursor) -> None:
+    """Convert Visits and Vaccinations to monthly range partitions, keeping rows, triggers and indexes"""
+    # новое правило для вакцинаций проверяется до любых изменений: строки, которые ему не отвечают,
+    # исправляет человек, а не миграция
+    cursor.execute(f"""
+        SELECT vaccination_id FROM Vaccinations
+        WHERE NOT (next_vaccination_date IS NULL OR next_vaccination_date
+                   BETWEEN vaccination_date AND vaccination_date + INTERVAL '{MAX_VACCINE_VALIDITY}')
+        ORDER BY vaccination_id""")
+    violators = [vaccination_id for vaccination_id, in cursor.fetchall()]
+    if violators:
+        shown = ', '.join(map(str, violators[:50])) + (f" и ещё {len(violators) - 50}" if len(violators) > 50 else '')
+        raise RuntimeError(f"Дата следующей вакцинации раньше даты вакцинации или позже чем через "
+                           f"{MAX_VACCINE_VALIDITY}: vaccination_id {shown}. Исправьте их и перезапустите миграции")
+    # материализованные отчёты ссылаются на исходные таблицы — пересоздаются после переноса.
+    # Имя схемы явное: create_report_views создаёт их в current_schema(), и DROP IF EXISTS без схемы
+    # удалил бы одноимённые отчёты дальше по search_path (в public, если миграции идут в другой схеме)
+    cursor.execute("SELECT current_schema()")
+    schema = cursor.fetchone()[0]
+    for report in REPORTS.values():
+        if report.materialized:
+            cursor.execute(sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {view}").format(
+                view=sql.Identifier(schema, report.view)))
+    for table, column in PARTITIONED.items():
+        _partition_table(cursor, table, column)
+
+    cursor.execute(f"""
+    ALTER TABLE Vaccinations ADD CONSTRAINT vaccinations_validity_check CHECK (
+        next_vaccination_date IS NULL
+        OR next_vaccination_date BETWEEN vaccination_date AND vaccination_date + INTERVAL '{MAX_VACCINE_VALIDITY}'
+    );
+    """)
+    # триггеры исходных таблиц удалены вместе с ними: заново теми же шагами миграций
+    create_trigger(cursor)
+    create_visit_counter(cursor)
+    create_indexes(cursor)
+    create_report_views(cursor)
+
+    # напоминания отбирают по next_vaccination_date; граница по vaccination_date отсекает старые секции
+    cursor.execute(f"""
+    CREATE OR REPLACE PROCEDURE generate_vaccination_reminders(days_ahead INTEGER)
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        reminder RECORD;
+    BEGIN
+        RAISE NOTICE 'Напоминания о вакцинациях в ближайшие % дней:', days_ahead;
+
+        FOR reminder IN
+            SELECT p.name AS pet_name, o.first_name, o.last_name, o.phone, o.email,
+                   v.vaccine_name, v.next_vaccination_date
+            FROM Vaccinations v
+            JOIN Pets p ON v.pet_id = p.pet_id
+            JOIN Owners o ON p.owner_id = o.owner_id
+            WHERE v.next_vaccination_date BETWEEN CURRENT_DATE AND (CURRENT_DATE + days_ahead * INTERVAL '1 day')
+              AND v.vaccination_date >= CURRENT_DATE - INTERVAL '{MAX_VACCINE_VALIDITY}'
+              AND v.vaccination_date <= CURRENT_DATE + days_ahead
+            ORDER BY v.next_vaccination_date
+        LOOP
+            RAISE NOTICE 'Питомец: %, Владелец: % % (тел: %, email: %), Вакцина: %, Срок: %',
+                reminder.pet_name, reminder.first_name, reminder.last_name,
+                reminder.phone, reminder.email, reminder.vaccine_name,
+                reminder.next_vaccination_date;
+        END LOOP;
+    END;
+    $$;
+    """)
+
+
+def maintain_partitions(connection, months_ahead: int = MONTHS_AHEAD) -> list:
+    """Create missing partitions from the current month up to `months_ahead` months ahead"""
+    autocommit = connection.autocommit
+    connection.autocommit = False
+    created = []
+    try:
+        with connection.cursor() as cursor:
+            # одновременно секции создаёт только один процесс
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('maintain_partitions'))")
+            this_month = month_start(date.today())
+            for table in PARTITIONED:
+                created += ensure_partitions(cursor, table, this_month, add_months(this_month, months_ahead))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.autocommit = autocommit
+    return created
+
+
+def detach_partitions(connection, table: str, before: date, archive: bool = True) -> list:
+    """Detach monthly partitions that end on or before `before`.
+
+    With `archive` they are moved to the archive schema and stay queryable
+    there; otherwise they are dropped. Per-pet visit counters keep counting
+    the detached visits, and their ids stay taken in partition_keys.
+    """
+    if table not in PARTITIONED:
+        raise ValueError(f"Таблица {table} не секционирована")
+    detached = []
+    autocommit = connection.autocommit
+    connection.autocommit = False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = to_regclass(%s)
+                ORDER BY c.relname""", (table,))
+            for name, in cursor.fetchall():
+                # месячные секции названы <таблица>_YYYY_MM, DEFAULT не трогаем
+                try:
+                    year, month = map(int, name[len(table) + 1:].split('_'))
+                    month_end = add_months(date(year, month, 1), 1)
+                except ValueError:
+                    continue
+                if month_end > before:
+                    continue
+                partition = sql.Identifier(name)
+                cursor.execute(sql.SQL("ALTER TABLE {parent} DETACH PARTITION {partition}").format(
+                    parent=sql.Identifier(table), partition=partition))
+                if archive:
+                    cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {schema}").format(
+                        schema=sql.Identifier(ARCHIVE_SCHEMA)))
+                    cursor.execute(sql.SQL("ALTER TABLE {partition} SET SCHEMA {schema}").format(
+                        partition=partition, schema=sql.Identifier(ARCHIVE_SCHEMA)))
+                else:
+                    cursor.execute(sql.SQL("DROP TABLE {partition}").format(partition=partition))
+                detached.append(name)
+            # DETACH не запускает триггеры: закэшированные страницы таблицы устарели
+            if detached:
+                bump_version(cursor, table)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.autocommit = autocommit
+    return detached
+
+
+class PartitionMaintainer(threading.Thread):
+    """Daemon thread keeping future monthly partitions in place"""
+
+    def __init__(self, db_pool, interval: float, months_ahead: int = MONTHS_AHEAD) -> None:
+        super().__init__(name="partition-maintainer", daemon=True)
+        self.db_pool = db_pool
+        self.interval = interval
+        self.months_ahead = months_ahead
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        current_route.set(self.name)
+        while True:
+            try:
+                with self.db_pool.connection() as connection:
+                    created = maintain_partitions(connection, self.months_ahead)
+                if created:
+                    logger.info("Созданы секции: %s", ', '.join(created))
+            except (psycopg2.Error, PoolTimeoutError):
+                logger.exception("Не удалось создать секции")
+            if self._stopped.wait(self.interval):
+                break
+
+    def stop(self) -> None:
+        self._stopped.set()
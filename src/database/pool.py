@@ -0,0 +1,102 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions, pool
+
+
+class PoolTimeoutError(Exception):
+    """No connection became free within the acquire timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections with bounded checkout wait"""
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float = 5.0, **conn_kwargs) -> None:
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **conn_kwargs)
+        # ThreadedConnectionPool сразу падает при исчерпании, семафор даёт ожидание с таймаутом
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_seconds = 0.0
+
+    @staticmethod
+    def _is_alive(connection) -> bool:
+        """Cheap health check run on every checkout, leaves the connection in autocommit"""
+        if connection.closed:
+            return False
+        try:
+            # autocommit до проверки: иначе SELECT открыл бы транзакцию, и включить autocommit было бы нельзя
+            connection.autocommit = True
+            # обычный курсор: проверка не должна попадать в метрики запросов
+            with connection.cursor(cursor_factory=extensions.cursor) as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Take a healthy autocommit connection, waiting up to `timeout` seconds"""
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(f"Нет свободных соединений за {self.timeout} с")
+        waited = time.perf_counter() - start
+        try:
+            connection = self._pool.getconn()
+            # после перезапуска сервера оборваны все простаивавшие соединения: они закрываются по одному,
+            # пока не найдётся живое или пул не откроет новое
+            discarded = 0
+            while not self._is_alive(connection):
+                self._pool.putconn(connection, close=True)
+                discarded += 1
+                if discarded > self.maxconn:
+                    raise psycopg2.OperationalError("Новое соединение с базой не прошло проверку")
+                connection = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_seconds += waited
+        return connection
+
+    def putconn(self, connection) -> None:
+        """Return a connection, rolling back anything left open by the request"""
+        close = bool(connection.closed)
+        if not close and connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                close = True
+        try:
+            self._pool.putconn(connection, close=close)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        connection = self.getconn()
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"min": self.minconn, "max": self.maxconn, "in_use": self._in_use,
+                    "checkouts": self._checkouts, "timeouts": self._timeouts,
+                    "wait_seconds": round(self._wait_seconds, 6)}
+
+    def closeall(self) -> None:
+        self._pool.closeall()
@@ -0,0 +1,147 @@
+from itertools import groupby
+
+from psycopg2.extras import execute_values
+
+from database.pagination import iter_named
+from database.partitions import MAX_VACCINE_VALIDITY
+
+# напоминаний (строк) в одной порции: отправка и запись в reminder_log идут порциями одной транзакцией
+REMINDER_CHUNK = 1000
+# строк за один FETCH из серверного курсора
+REMINDER_ITERSIZE = 5000
+
+REMINDER_FIELDS = ('owner_id', 'first_name', 'last_name', 'phone', 'email',
+                   'pet_id', 'pet_name', 'vaccination_id', 'vaccine_name', 'next_vaccination_date')
+
+
+def create_reminder_index(cursor) -> None:
+    """Partial covering index on Vaccinations(next_vaccination_date) for due_vaccination_reminders"""
+    # в INCLUDE все столбцы Vaccinations, которые читает функция, в том числе vaccination_date из её условия:
+    # диапазон по next_vaccination_date читается index-only scan без обращения к куче
+    cursor.execute("""
+    DROP INDEX IF EXISTS idx_vaccinations_next_date;
+    CREATE INDEX idx_vaccinations_next_date ON Vaccinations (next_vaccination_date)
+        INCLUDE (pet_id, vaccination_id, vaccine_name, vaccination_date)
+        WHERE next_vaccination_date IS NOT NULL;
+    """)
+
+
+def create_reminders(cursor) -> None:
+    """Covering index for due vaccinations, the reminder log and the due_vaccination_reminders set function"""
+    create_reminder_index(cursor)
+    cursor.execute(f"""
+    -- отправленные напоминания: повторный запуск пропускает их, перенос срока прививки даёт новое напоминание
+    CREATE TABLE IF NOT EXISTS reminder_log (
+        vaccination_id INTEGER NOT NULL,
+        next_vaccination_date DATE NOT NULL,
+        owner_id INTEGER NOT NULL REFERENCES Owners(owner_id) ON DELETE CASCADE,
+        sent_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (vaccination_id, next_vaccination_date)
+    );
+
+    -- Ещё не отправленные напоминания на days_ahead дней вперёд, по владельцам.
+    -- SQL-функция STABLE из одного SELECT встраивается в вызывающий запрос: LIMIT и отсечение секций
+    -- работают так же, как у обычного запроса; after_owner_id — постраничное чтение по ключу владельца.
+    CREATE OR REPLACE FUNCTION due_vaccination_reminders(days_ahead INTEGER, after_owner_id INTEGER DEFAULT 0)
+    RETURNS TABLE (
+        owner_id INTEGER, first_name VARCHAR, last_name VARCHAR, phone VARCHAR, email VARCHAR,
+        pet_id INTEGER, pet_name VARCHAR, vaccination_id INTEGER, vaccine_name VARCHAR, next_vaccination_date DATE
+    )
+    LANGUAGE sql STABLE
+    AS $$
+        SELECT o.owner_id, o.first_name, o.last_name, o.phone, o.email,
+               p.pet_id, p.name, v.vaccination_id, v.vaccine_name, v.next_vaccination_date
+        FROM Vaccinations v
+        JOIN Pets p ON p.pet_id = v.pet_id
+        JOIN Owners o ON o.owner_id = p.owner_id
+        WHERE v.next_vaccination_date BETWEEN CURRENT_DATE AND CURRENT_DATE + days_ahead
+          AND v.vaccination_date >= CURRENT_DATE - INTERVAL '{MAX_VACCINE_VALIDITY}'
+          AND v.vaccination_date <= CURRENT_DATE + days_ahead
+          AND o.owner_id > after_owner_id
+          AND NOT EXISTS (
+              SELECT 1 FROM reminder_log r
+              WHERE r.vaccination_id = v.vaccination_id
+                AND r.next_vaccination_date = v.next_vaccination_date
+          )
+        ORDER BY o.owner_id, v.next_vaccination_date, v.vaccination_id
+    $$;
+
+    -- прежний интерфейс для psql: те же строки, что отдаёт функция
+    CREATE OR REPLACE PROCEDURE generate_vaccination_reminders(days_ahead INTEGER)
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        reminder RECORD;
+    BEGIN
+        RAISE NOTICE 'Напоминания о вакцинациях в ближайшие % дней:', days_ahead;
+
+        FOR reminder IN SELECT * FROM due_vaccination_reminders(days_ahead) LOOP
+            RAISE NOTICE 'Питомец: %, Владелец: % % (тел: %, email: %), Вакцина: %, Срок: %',
+                reminder.pet_name, reminder.first_name, reminder.last_name,
+                reminder.phone, reminder.email, reminder.vaccine_name,
+                reminder.next_vaccination_date;
+        END LOOP;
+    END;
+    $$;
+    """)
+
+
+def _owner_message(rows: list) -> dict:
+    """One reminder per owner; a vaccine repeated for the same pet is mentioned once, with the nearest date"""
+    first = rows[0]
+    vaccinations = {}
+    for row in rows:
+        vaccinations.setdefault((row['pet_id'], row['vaccine_name']), row)
+    return {
+        "owner_id": first['owner_id'],
+        "name": f"{first['first_name']} {first['last_name']}",
+        "phone": first['phone'],
+        "email": first['email'],
+        "vaccinations": [{"pet_id": row['pet_id'], "pet_name": row['pet_name'], "vaccine_name": row['vaccine_name'],
+                          "next_vaccination_date": row['next_vaccination_date'].isoformat()}
+                         for row in vaccinations.values()],
+    }
+
+
+def _record_sent(connection, rows: list) -> None:
+    with connection.cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO reminder_log (vaccination_id, next_vaccination_date, owner_id) VALUES %s
+            ON CONFLICT DO NOTHING""",
+            [(row['vaccination_id'], row['next_vaccination_date'], row['owner_id']) for row in rows],
+            page_size=len(rows))
+    connection.commit()
+
+
+def send_reminders(db_pool, send, days_ahead: int = 30, chunk_rows: int = REMINDER_CHUNK,
+                   itersize: int = REMINDER_ITERSIZE) -> dict:
+    """Send due vaccination reminders in chunks, one message per owner; return counts.
+
+    Rows are streamed from a server-side cursor in owner order, so the whole
+    due set is never held in memory. `send` gets a list of owner messages per
+    chunk; once it returns, the chunk's vaccinations go to reminder_log and a
+    rerun skips them. A chunk that fails in `send` is not recorded and will be
+    sent again next time.
+    """
+    if days_ahead < 0:
+        raise ValueError("Число дней не может быть отрицательным")
+    owners = reminders = chunks = 0
+    with db_pool.connection() as reader, db_pool.connection() as writer:
+        rows = (dict(zip(REMINDER_FIELDS, row))
+                for row in iter_named(reader, "SELECT * FROM due_vaccination_reminders(%s)", (days_ahead,), itersize))
+        messages, sent = [], []
+        # строки идут по owner_id: все прививки владельца попадают в одно сообщение и в одну порцию
+        for _, owner_rows in groupby(rows, key=lambda row: row['owner_id']):
+            owner_rows = list(owner_rows)
+            messages.append(_owner_message(owner_rows))
+            sent += owner_rows
+            if len(sent) >= chunk_rows:
+                send(messages)
+                _record_sent(writer, sent)
+                owners, reminders, chunks = owners + len(messages), reminders + len(sent), chunks + 1
+                messages, sent = [], []
+        if messages:
+            send(messages)
+            _record_sent(writer, sent)
+            owners, reminders, chunks = owners + len(messages), reminders + len(sent), chunks + 1
+    return {"owners": owners, "reminders": reminders, "chunks": chunks}
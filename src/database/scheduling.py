@@ -0,0 +1,165 @@
+from datetime import date
+
+from psycopg2 import sql
+
+# длительность приёма: визит занимает [visit_date, visit_date + 30 минут)
+VISIT_LENGTH = '30 minutes'
+# наибольший период поиска свободных окон за один запрос, дней
+MAX_SLOT_DAYS = 31
+
+
+def add_overlap_constraint(cursor, table: str) -> None:
+    """Exclusion constraint <table>_vet_no_overlap on Visits or one of its partitions"""
+    # GiST-индекс ограничения отвергает пересекающиеся записи атомарно, без блокировок и проверок заранее
+    constraint = sql.Identifier(f"{table}_vet_no_overlap")
+    cursor.execute(sql.SQL("""
+    ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint};
+    ALTER TABLE {table} ADD CONSTRAINT {constraint}
+        EXCLUDE USING gist (vet_id WITH =, tsrange(visit_date, visit_date + INTERVAL {length}) WITH &&)
+        WHERE (status = 'scheduled');
+    """).format(table=sql.Identifier(table), constraint=constraint, length=sql.Literal(VISIT_LENGTH)))
+
+
+def create_visit_schedule(cursor) -> None:
+    """Exclusion constraint against double-booking a vet, the free-slot finder and schedule_visit on top of them"""
+    # записи, созданные до ограничения, миграция не трогает: пересечения разбирает человек
+    cursor.execute(f"""
+        SELECT o.visit_id, v.visit_id
+        FROM Visits v
+        JOIN Visits o ON o.vet_id = v.vet_id AND o.visit_id < v.visit_id
+        WHERE v.status = 'scheduled' AND o.status = 'scheduled'
+          AND o.visit_date > v.visit_date - INTERVAL '{VISIT_LENGTH}'
+          AND o.visit_date < v.visit_date + INTERVAL '{VISIT_LENGTH}'
+        ORDER BY o.visit_id, v.visit_id""")
+    conflicts = cursor.fetchall()
+    if conflicts:
+        shown = ', '.join(f"{first} и {second}" for first, second in conflicts[:50])
+        more = f" и ещё {len(conflicts) - 50}" if len(conflicts) > 50 else ''
+        raise RuntimeError(f"Запланированные визиты одного ветеринара пересекаются по времени (visit_id): "
+                           f"{shown}{more}. Перенесите или отмените их и перезапустите миграции")
+
+    cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    add_overlap_constraint(cursor, 'visits')
+
+    cursor.execute(f"""
+    CREATE OR REPLACE PROCEDURE schedule_visit(
+        pet_id_param INTEGER,
+        vet_id_param INTEGER,
+        clinic_id_param INTEGER,
+        visit_datetime TIMESTAMP,
+        reason TEXT DEFAULT NULL
+    )
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        BEGIN
+            INSERT INTO Visits (pet_id, vet_id, clinic_id, visit_date, status, diagnosis)
+            VALUES (pet_id_param, vet_id_param, clinic_id_param, visit_datetime, 'scheduled', reason);
+        EXCEPTION
+            WHEN exclusion_violation THEN
+                RAISE EXCEPTION 'Ветеринар занят в указанное время';
+        END;
+        COMMIT;
+
+        RAISE NOTICE 'Визит успешно запланирован на %', visit_datetime;
+    END;
+    $$;
+
+    -- Свободные окна всех ветеринаров клиники в рабочие часы за период [from_date, to_date]
+    CREATE OR REPLACE FUNCTION find_free_slots(
+        clinic_id_param INTEGER,
+        from_date DATE,
+        to_date DATE,
+        slot_length INTERVAL DEFAULT INTERVAL '{VISIT_LENGTH}'
+    )
+    RETURNS TABLE (vet_id INTEGER, slot_start TIMESTAMP, slot_end TIMESTAMP)
+    LANGUAGE sql STABLE
+    AS $$
+        SELECT vet.vet_id, slots.starts_at, slots.starts_at + slot_length
+        FROM Veterinarians vet
+        JOIN Clinics c ON c.clinic_id = vet.clinic_id
+        CROSS JOIN generate_series(from_date::timestamp, to_date::timestamp, INTERVAL '1 day') AS days(day_start)
+        CROSS JOIN LATERAL generate_series(
+            days.day_start + split_part(c.working_hours, '-', 1)::time,
+            days.day_start + split_part(c.working_hours, '-', 2)::time - slot_length,
+            slot_length) AS slots(starts_at)
+        WHERE vet.clinic_id = clinic_id_param
+          AND slots.starts_at > LOCALTIMESTAMP
+          -- будущие визиты — это записи 'scheduled', условие совпадает с индексом ограничения;
+          -- границы по visit_date отсекают месячные секции, которые не могут пересечь период и окно
+          AND NOT EXISTS (
+              SELECT 1 FROM Visits v
+              WHERE v.vet_id = vet.vet_id
+                AND v.status = 'scheduled'
+                AND v.visit_date > from_date - INTERVAL '{VISIT_LENGTH}'
+                AND v.visit_date < to_date + INTERVAL '1 day'
+                AND v.visit_date > slots.starts_at - INTERVAL '{VISIT_LENGTH}'
+                AND v.visit_date < slots.starts_at + slot_length
+                AND tsrange(v.visit_date, v.visit_date + INTERVAL '{VISIT_LENGTH}')
+                    && tsrange(slots.starts_at, slots.starts_at + slot_length)
+          )
+        ORDER BY vet.vet_id, slots.starts_at
+    $$;
+    """)
+
+
+def create_boundary_overlap_check(cursor) -> None:
+    """Overlap check for visits near a month start, which per-partition exclusion constraints cannot see"""
+    # Ограничение исключения живёт в каждой месячной секции отдельно. Визиты по разные стороны границы
+    # месяца (31-е 23:45 и 1-е 00:00) проверяет триггер: такие записи берут advisory-блокировку ветеринара,
+    # поэтому две пересекающиеся записи у границы идут по очереди и вторая видит первую.
+    cursor.execute(f"""
+    CREATE OR REPLACE FUNCTION check_boundary_overlap() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    DECLARE
+        month_start TIMESTAMP := date_trunc('month', NEW.visit_date);
+    BEGIN
+        IF NEW.status IS DISTINCT FROM 'scheduled' OR NEW.vet_id IS NULL
+           OR (NEW.visit_date >= month_start + INTERVAL '{VISIT_LENGTH}'
+               AND NEW.visit_date + INTERVAL '{VISIT_LENGTH}' <= month_start + INTERVAL '1 month') THEN
+            RETURN NEW;
+        END IF;
+
+        PERFORM pg_advisory_xact_lock(hashtext('visits_vet_schedule'), NEW.vet_id);
+        IF EXISTS (
+            SELECT 1 FROM Visits v
+            WHERE v.vet_id = NEW.vet_id
+              AND v.status = 'scheduled'
+              AND v.visit_id <> NEW.visit_id
+              -- граница по visit_date оставляет только секции двух соседних месяцев
+              AND v.visit_date > NEW.visit_date - INTERVAL '{VISIT_LENGTH}'
+              AND v.visit_date < NEW.visit_date + INTERVAL '{VISIT_LENGTH}'
+              AND tsrange(v.visit_date, v.visit_date + INTERVAL '{VISIT_LENGTH}')
+                  && tsrange(NEW.visit_date, NEW.visit_date + INTERVAL '{VISIT_LENGTH}')
+        ) THEN
+            RAISE EXCEPTION 'Визит ветеринара % пересекается с другим визитом на границе месяца', NEW.vet_id
+                USING ERRCODE = 'exclusion_violation';
+        END IF;
+        RETURN NEW;
+    END;
+    $$;
+
+    CREATE OR REPLACE TRIGGER trg_check_boundary_overlap
+    BEFORE INSERT OR UPDATE OF visit_date, vet_id, status ON Visits
+    FOR EACH ROW
+    EXECUTE FUNCTION check_boundary_overlap();
+    """)
+
+
+def find_free_slots(connection, clinic_id: int, start: date, end: date) -> list:
+    """Open slots of every vet of the clinic, as [{"vet_id": ..., "slots": [start, ...]}] in vet order"""
+    if end < start:
+        raise ValueError("Конец периода раньше начала")
+    if (end - start).days >= MAX_SLOT_DAYS:
+        raise ValueError(f"Период поиска — не больше {MAX_SLOT_DAYS} дней")
+    vets = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT vet_id, slot_start FROM find_free_slots(%s, %s, %s) ORDER BY vet_id, slot_start",
+                       (clinic_id, start, end))
+        for vet_id, slot_start in cursor:
+            if not vets or vets[-1]["vet_id"] != vet_id:
+                vets.append({"vet_id": vet_id, "slots": []})
+            vets[-1]["slots"].append(slot_start.isoformat(timespec='minutes'))
+    return vets
@@ -0,0 +1,101 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class TableInfo:
+    """Catalog facts about one table, columns in ordinal order"""
+    name: str
+    columns: list
+    column_types: dict
+    primary_key: str = None
+    foreign_keys: dict = field(default_factory=dict)
+    # все столбцы первичного ключа; у секционированных таблиц к id добавлен столбец секционирования
+    key_columns: list = field(default_factory=list)
+
+    @property
+    def key_index(self) -> int:
+        return self.columns.index(self.primary_key) if self.primary_key in self.columns else 0
+
+    @property
+    def key(self) -> str:
+        return self.primary_key or self.columns[0]
+
+
+class SchemaCache:
+    """Table/column/key metadata loaded once and shared by every request"""
+
+    def __init__(self, db_pool, ttl: float = 300, schema: str = 'public', exclude=()) -> None:
+        self._pool = db_pool
+        self.ttl = ttl
+        self.schema = schema
+        # служебные таблицы, которые не показываются в интерфейсе
+        self.exclude = set(exclude)
+        self._lock = threading.Lock()
+        self._tables = None
+        self._loaded_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tables = None
+
+    def _load(self) -> dict:
+        tables = {}
+        with self._pool.connection() as connection, connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT c.table_name, c.column_name, c.data_type
+                FROM information_schema.columns c
+                JOIN information_schema.tables t
+                  ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+                JOIN pg_catalog.pg_class pc
+                  ON pc.relname = t.table_name AND pc.relnamespace = to_regnamespace(t.table_schema)
+                WHERE c.table_schema = %s AND t.table_type = 'BASE TABLE' AND NOT pc.relispartition
+                ORDER BY c.table_name, c.ordinal_position""", (self.schema,))
+            for table_name, column_name, data_type in cursor.fetchall():
+                if table_name in self.exclude:
+                    continue
+                table = tables.setdefault(table_name, TableInfo(table_name, [], {}))
+                table.columns.append(column_name)
+                table.column_types[column_name] = data_type
+
+            # ключ строки — первый столбец первичного ключа (visit_id у секционированной Visits)
+            cursor.execute("""
+                SELECT tc.table_name, kcu.column_name
+                FROM information_schema.table_constraints tc
+                JOIN information_schema.key_column_usage kcu
+                  ON kcu.constraint_schema = tc.constraint_schema AND kcu.constraint_name = tc.constraint_name
+                WHERE tc.table_schema = %s AND tc.constraint_type = 'PRIMARY KEY'
+                ORDER BY tc.table_name, kcu.ordinal_position""", (self.schema,))
+            for table_name, column_name in cursor.fetchall():
+                if table_name in tables:
+                    tables[table_name].key_columns.append(column_name)
+                    if tables[table_name].primary_key is None:
+                        tables[table_name].primary_key = column_name
+
+            cursor.execute("""
+                SELECT kcu.table_name, kcu.column_name, ccu.table_name, ccu.column_name
+                FROM information_schema.table_constraints tc
+                JOIN information_schema.key_column_usage kcu
+                  ON kcu.constraint_schema = tc.constraint_schema AND kcu.constraint_name = tc.constraint_name
+                JOIN information_schema.constraint_column_usage ccu
+                  ON ccu.constraint_schema = tc.constraint_schema AND ccu.constraint_name = tc.constraint_name
+                WHERE tc.table_schema = %s AND tc.constraint_type = 'FOREIGN KEY'""", (self.schema,))
+            for table_name, column_name, target_table, target_column in cursor.fetchall():
+                if table_name in tables:
+                    tables[table_name].foreign_keys[column_name] = (target_table, target_column)
+        return tables
+
+    def _get(self) -> dict:
+        with self._lock:
+            if self._tables is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._tables = self._load()
+                self._loaded_at = time.monotonic()
+            return self._tables
+
+    def tables(self) -> list:
+        return sorted(self._get())
+
+    def table(self, table_name: str) -> TableInfo:
+        """Metadata for a known table, None for anything else"""
+        return self._get().get(table_name)
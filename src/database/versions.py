@@ -0,0 +1,81 @@
+# таблицы create_all_tables, изменения которых отслеживаются для условных GET
+TRACKED_TABLES = ('clinics', 'veterinarians', 'owners', 'pets', 'visits', 'vaccinations')
+# строк версии на таблицу: столько пишущих транзакций одной таблицы идут параллельно, не дожидаясь друг друга
+VERSION_SHARDS = 16
+
+# версия — сумма по строкам таблицы, растёт с каждой зафиксированной пишущей транзакцией;
+# HAVING отсекает неотслеживаемые таблицы (агрегат без строк всё равно вернул бы строку NULL)
+VERSION_QUERY = """
+    SELECT SUM(version)::bigint, MAX(changed_at) FROM table_versions
+    WHERE table_name = %s
+    HAVING COUNT(*) > 0
+"""
+
+
+def create_table_versions(cursor) -> None:
+    """Per-table change version, bumped once per modifying transaction in one of VERSION_SHARDS rows"""
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name VARCHAR(63) NOT NULL,
+        shard SMALLINT NOT NULL,
+        version BIGINT NOT NULL DEFAULT 0,
+        changed_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+        PRIMARY KEY (table_name, shard)
+    );
+
+    -- Строка версии обновляется в транзакции изменения: новая версия видна только вместе с данными.
+    -- Транзакция берёт первую свободную строку своей таблицы (SKIP LOCKED) и держит только её, поэтому
+    -- долгий импорт не задерживает остальные пишущие транзакции; ждать приходится, лишь когда заняты все
+    -- {VERSION_SHARDS} строк. Следующие операторы той же транзакции версию не трогают: при COMMIT она всё
+    -- равно вырастет один раз. Для секционированных таблиц операторный триггер родителя получает имя родителя.
+    CREATE OR REPLACE FUNCTION bump_table_version() RETURNS TRIGGER
+    LANGUAGE PLPGSQL
+    AS
+    $$
+    DECLARE
+        bumped TEXT := 'clinics.version_bumped_' || TG_TABLE_NAME;
+        picked SMALLINT;
+    BEGIN
+        IF current_setting(bumped, true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        SELECT shard INTO picked FROM table_versions
+        WHERE table_name = TG_TABLE_NAME
+        ORDER BY shard
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED;
+        IF NOT FOUND THEN
+            picked := txid_current() % {VERSION_SHARDS};
+        END IF;
+        UPDATE table_versions SET version = version + 1, changed_at = clock_timestamp()
+        WHERE table_name = TG_TABLE_NAME AND shard = picked;
+        PERFORM set_config(bumped, 'on', true);
+        RETURN NULL;
+    END;
+    $$;
+    """)
+    for table in TRACKED_TABLES:
+        cursor.execute(f"""
+        INSERT INTO table_versions (table_name, shard)
+        SELECT '{table}', shard FROM generate_series(0, {VERSION_SHARDS - 1}) shard
+        ON CONFLICT (table_name, shard) DO NOTHING;
+
+        CREATE OR REPLACE TRIGGER trg_{table}_version
+        AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION bump_table_version();
+        """)
+
+
+def bump_version(cursor, table: str) -> None:
+    """Mark a table changed by DDL that bypasses its triggers, such as detaching a partition"""
+    cursor.execute("""
+        UPDATE table_versions SET version = version + 1, changed_at = clock_timestamp()
+        WHERE table_name = %s AND shard = 0""", (table,))
+
+
+def table_version(connection, table: str):
+    """(version, changed_at) of a tracked table, or None for tables without version rows"""
+    with connection.cursor() as cursor:
+        cursor.execute(VERSION_QUERY, (table,))
+        return cursor.fetchone()
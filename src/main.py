@@ -1,40 +1,154 @@
+import io
 import os
-import psycopg2
-from dotenv import load_dotenv
-from flask import Flask, request, render_template, redirect, url_for
-
-from database.create_database import create_all_tables, create_trigger, insert_test_data, create_indexes, create_procedurs
-
-# получение данных для входа
-if not load_dotenv():
-    raise ValueError("Не удалось загрузить .env файл")
-USER = os.getenv("USER")
-PASSWD_DB = os.getenv("PASSWD_DB")
-HOST = os.getenv("HOST")
-PORT = int(os.getenv("PORT"))
-
-connection = psycopg2.connect(dbname='Clinics', user=USER, password=PASSWD_DB, host=HOST, port=PORT)
-connection.autocommit = True
-cursor = connection.cursor()
-
-cursor.execute("""
-    SELECT table_name
-    FROM information_schema.tables
-    WHERE table_schema = 'public'; """)
-tables = [i[0] for i in cursor.fetchall()]
-
-# создание и заполнение таблиц, создание триггера, индексов, процедуры
-create_all_tables(cursor)
-create_trigger(cursor)
-# insert_test_data(cursor)
-create_indexes(cursor)
-create_procedurs(cursor)
+import time
+from datetime import date, timedelta
+from flask import (Flask, Response, request, render_template, stream_template, stream_with_context, redirect,
+                   url_for, g, jsonify)
+
+from config import (DB_PARAMS, POOL_MIN, POOL_MAX, POOL_TIMEOUT, SCHEMA_TTL, METRICS_ENABLED, SLOW_QUERY_MS,
+                    SLOW_QUERY_EXPLAIN)
+from database.batch import apply_batch
+from database.bulk_import import import_csv
+from database.cache import TTLCache
+from database.export import iter_export, parse_since
+from database.filters import parse_view
+from database.history import pet_history
+from database.instrumentation import InstrumentedCursor, current_route, metrics
+from database.migrations import SERVICE_TABLES, migrate
+from database.pagination import fetch_page, open_page
+from database.partitions import PartitionMaintainer
+from database.pool import ConnectionPool
+from database.reports import REPORTS, ReportRefresher, report_etag, run_report
+from database.scheduling import find_free_slots
+from database.schema import SchemaCache
+from database.versions import table_version
+
+# размер страницы при просмотре таблицы
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+MAX_PAGE_SIZE = 1000
+# потоковая отрисовка страниц таблиц и компактная разметка строк
+STREAM_PAGES = os.getenv("STREAM_PAGES", "0") == "1"
+COMPACT_ROWS = os.getenv("COMPACT_ROWS", "0") == "1"
+STREAM_CHUNK_SIZE = 8192
+# кэш результатов отчётов и период обновления материализованных представлений, секунды
+REPORT_CACHE_TTL = float(os.getenv("REPORT_CACHE_TTL", 60))
+REPORT_REFRESH_INTERVAL = float(os.getenv("REPORT_REFRESH_INTERVAL", 900))
+REPORT_ROW_LIMIT = 1000
+# кэш отрисованных страниц таблиц по (версия таблицы, параметры запроса); 0 — отключить
+PAGE_CACHE_SIZE = int(os.getenv("PAGE_CACHE_SIZE", 256))
+PAGE_CACHE_TTL = 600
+# кэш истории питомцев: запись проверяется по версии при каждом запросе, TTL лишь ограничивает срок хранения
+PET_HISTORY_CACHE_TTL = float(os.getenv("PET_HISTORY_CACHE_TTL", 300))
+PET_HISTORY_CACHE_SIZE = 10000
+# как часто проверять, что секции Visits/Vaccinations на ближайшие месяцы созданы, секунды
+PARTITION_CHECK_INTERVAL = float(os.getenv("PARTITION_CHECK_INTERVAL", 86400))
+
+metrics.configure(METRICS_ENABLED, SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN)
+# без METRICS_ENABLED соединения работают на обычном курсоре psycopg2
+cursor_options = {'cursor_factory': InstrumentedCursor} if METRICS_ENABLED else {}
+db_pool = ConnectionPool(POOL_MIN, POOL_MAX, POOL_TIMEOUT, **DB_PARAMS, **cursor_options)
+
+schema = SchemaCache(db_pool, ttl=SCHEMA_TTL, exclude=SERVICE_TABLES)
+
+# создание таблиц, триггеров, индексов и процедур — только недостающие миграции
+with db_pool.connection() as connection:
+    migrate(connection)
+
+report_cache = TTLCache(REPORT_CACHE_TTL)
+history_cache = TTLCache(PET_HISTORY_CACHE_TTL, maxsize=PET_HISTORY_CACHE_SIZE)
+page_cache = TTLCache(PAGE_CACHE_TTL, maxsize=PAGE_CACHE_SIZE) if PAGE_CACHE_SIZE > 0 else None
+
+
+def invalidate_reports(timings: dict) -> None:
+    for name in timings:
+        report_cache.invalidate(name)
+
+
+if REPORT_REFRESH_INTERVAL > 0:
+    ReportRefresher(db_pool, REPORT_REFRESH_INTERVAL, on_refresh=invalidate_reports).start()
+if PARTITION_CHECK_INTERVAL > 0:
+    PartitionMaintainer(db_pool, PARTITION_CHECK_INTERVAL).start()
 
 app = Flask(__name__)
 
+
+def get_connection():
+    """Connection bound to the current request"""
+    if 'db_connection' not in g:
+        g.db_connection = db_pool.getconn()
+    return g.db_connection
+
+
+def get_cursor():
+    """Cursor on the connection bound to the current request"""
+    return get_connection().cursor()
+
+
+def buffered(chunks, size: int = STREAM_CHUNK_SIZE):
+    """Glue tiny template fragments into network-sized chunks"""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def table_validators(table_name: str, *variant):
+    """(ETag, Last-Modified) of a response built from one table, None for tables without a change version"""
+    row = table_version(get_connection(), table_name)
+    if row is None:
+        return None
+    version, changed_at = row
+    # параметры, которые берутся не из URL (размер страницы по умолчанию, формат), тоже различают ответы
+    return '-'.join(str(part) for part in (table_name, version, *variant)), changed_at
+
+
+def not_modified(etag: str, last_modified=None) -> bool:
+    """Whether the client's copy is current; If-None-Match takes precedence over If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since is not None and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def with_validators(response, etag: str, last_modified=None):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # браузер не берёт страницу из своего кэша молча, а переспрашивает сервер и получает короткий 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.before_request
+def start_request_timer() -> None:
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+        current_route.set(request.endpoint or '-')
+
+
+@app.after_request
+def record_request_time(response):
+    if metrics.enabled and 'request_started' in g:
+        metrics.observe_request(request.endpoint or '-', time.perf_counter() - g.request_started)
+    return response
+
+
+@app.teardown_appcontext
+def release_connection(exception) -> None:
+    connection = g.pop('db_connection', None)
+    if connection is not None:
+        db_pool.putconn(connection)
+
+
 @app.route('/')
 def index(): 
-    return render_template("choice.html", tables=tables)
+    return render_template("choice.html", tables=schema.tables())
 
 @app.route('/display_table', methods=['GET', 'POST'])
 def display_table():
@@ -42,56 +156,212 @@ def display_table():
         table_name = request.form.get('table_name')
     else:
         table_name = request.args.get('table_name')
-    if table_name not in tables:
+    table = schema.table(table_name)
+    if table is None:
         return redirect(url_for('index'))
-    cursor.execute(f"SELECT * FROM {table_name} ORDER BY 1")
-    data = cursor.fetchall()
+    try:
+        view = parse_view(table, request.args)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    sort_index = None
+    if view.sort is not None and view.sort != table.key:
+        # при сортировке не по ключу граница страницы — пара (значение, ключ); нет *_value — значит NULL
+        sort_index = table.columns.index(view.sort)
+        after = (request.args.get('after_value'), after) if after is not None else None
+        before = (request.args.get('before_value'), before) if before is not None else None
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    compact = request.args.get('compact', int(COMPACT_ROWS), type=int) == 1
+
+    context = dict(table_name=table_name, columns=table.columns, key=table.key, key_index=table.key_index,
+                   limit=limit, compact=compact, view=view, view_args=view.url_args())
+
+    # версия читается до страницы: изменение между ними даст лишний повторный запрос, но не устаревший 304
+    validators = table_validators(table_name, limit, int(compact)) if request.method == 'GET' else None
+    if validators is not None and not_modified(*validators):
+        return with_validators(Response(status=304), *validators)
 
-    cursor.execute(f"SELECT column_name FROM information_schema.columns WHERE table_name = '{table_name}'")
-    columns = [column[0] for column in cursor.fetchall()]
-    return render_template("tables3.html", table_name=table_name, data=data, columns=columns)
+    if STREAM_PAGES:
+        # строки идут в шаблон прямо из серверного курсора, ответ отдаётся по частям
+        page = open_page(get_connection(), table_name, table.key, after=after, before=before, limit=limit,
+                         key_index=table.key_index, view=view, sort_index=sort_index)
+        response = Response(buffered(stream_template("tables3.html", data=page, page=page, **context)))
+        return with_validators(response, *validators) if validators is not None else response
+
+    cache_key = (validators[0], request.query_string) if validators is not None and page_cache is not None else None
+    html = page_cache.get(cache_key) if cache_key is not None else None
+    if html is None:
+        page = fetch_page(get_connection(), table_name, table.key, after=after, before=before, limit=limit,
+                          key_index=table.key_index, view=view, sort_index=sort_index)
+        html = render_template("tables3.html", data=page['rows'], page=page, **context)
+        if cache_key is not None:
+            page_cache.set(cache_key, html)
+    response = Response(html)
+    return with_validators(response, *validators) if validators is not None else response
 
 @app.route('/delete', methods=['POST'])
 def delete():
     id = request.form['id']
-    table_name = request.form['table_name']
-    columns = request.form['columns']
-    cursor.execute('DELETE FROM ' +  table_name + ' WHERE ' + columns + '=' + id)   
+    table_name = request.values['table_name']
+    table = schema.table(table_name)
+    if table is None:
+        return redirect(url_for('index'))
+    cursor = get_cursor()
+    cursor.execute(f"DELETE FROM {table_name} WHERE {table.key} = %s", (id,))
     return redirect(url_for('display_table', table_name=table_name))
 
 @app.route('/update', methods=['POST'])
 def update():
     row_id = request.form['id']
-    table_name = request.form['table_name']
-    columns = request.form['columns']
+    table_name = request.values['table_name']
+    table = schema.table(table_name)
+    if table is None:
+        return redirect(url_for('index'))
 
-    update_data = {key: value for key, value in request.form.items() if key not in ['id', 'table_name', 'columns']}
+    # в SET попадают только настоящие столбцы таблицы, ключ не меняется
+    update_data = {key: value for key, value in request.form.items()
+                   if key in table.columns and key != table.key}
 
-    set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
-    values = list(update_data.values())
-    values.append(row_id)
-    cursor.execute(f"UPDATE {table_name} SET {set_clause} WHERE {columns} = %s", values)
+    if update_data:
+        set_clause = ", ".join([f"{key} = %s" for key in update_data.keys()])
+        values = list(update_data.values())
+        values.append(row_id)
+        cursor = get_cursor()
+        cursor.execute(f"UPDATE {table_name} SET {set_clause} WHERE {table.key} = %s", values)
     return redirect(url_for('display_table', table_name=table_name))
 
+@app.route('/batch/<table_name>', methods=['POST'])
+def batch(table_name):
+    """Apply {"update": [{key: id, column: value}], "delete": [id]} to the table in one transaction"""
+    table = schema.table(table_name)
+    if table is None:
+        return jsonify(error=f"Неизвестная таблица {table_name}"), 404
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Ожидается JSON-объект с полями update и delete"), 400
+    updates, deletes = payload.get('update', []), payload.get('delete', [])
+    if not isinstance(updates, list) or not all(isinstance(change, dict) for change in updates) \
+            or not isinstance(deletes, list):
+        return jsonify(error="update — список объектов, delete — список ключей"), 400
+    try:
+        result = apply_batch(get_connection(), table, updates, deletes)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(result)
+
 @app.route('/add_record/<table_name>', methods=['GET', 'POST'])
 def add_record(table_name):
+    table = schema.table(table_name)
+    if table is None:
+        return redirect(url_for('index'))
 
     if request.method == 'POST':
         # Получаем данные из формы
-        data = {key: value for key, value in request.form.items() if key != 'table_name'}
+        data = {key: value for key, value in request.form.items() if key in table.columns}
 
         # Формируем и выполняем SQL-запрос для добавления новой записи
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['%s'] * len(data))
         query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
 
-        cursor.execute(query, list(data.values()))
+        get_cursor().execute(query, list(data.values()))
+
+    return render_template('add_record.html', table_name=table_name, columns=table.columns)
+
+
+@app.route('/import/<table_name>', methods=['POST'])
+def import_table(table_name):
+    """Load CSV (multipart 'file' or a raw text/csv body) into the table via COPY"""
+    table = schema.table(table_name)
+    if table is None:
+        return jsonify(error=f"Неизвестная таблица {table_name}"), 404
+    upsert = request.values.get('upsert', 0, type=int) == 1
+
+    if request.mimetype == 'multipart/form-data':
+        if 'file' not in request.files:
+            return jsonify(error="Не передан файл"), 400
+        raw = request.files['file'].stream
+    else:
+        raw = request.stream
+    stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+    try:
+        report = import_csv(get_connection(), table, stream, upsert=upsert)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(report)
+
+
+@app.route('/export/<table_name>')
+def export_table(table_name):
+    """Stream the whole table as CSV or JSON lines, optionally only rows since a date"""
+    table = schema.table(table_name)
+    if table is None:
+        return jsonify(error=f"Неизвестная таблица {table_name}"), 404
+    export_format = request.args.get('format', 'csv')
+    try:
+        since = parse_since(request.args['since']) if 'since' in request.args else None
+        chunks = iter_export(get_connection(), table, export_format, since=since)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    validators = table_validators(table_name, export_format)
+    if validators is not None and not_modified(*validators):
+        return with_validators(Response(status=304), *validators)
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    headers = {'Content-Disposition': f'attachment; filename={table_name}.{export_format}'}
+    response = Response(stream_with_context(buffered(chunks)), mimetype=mimetype, headers=headers)
+    return with_validators(response, *validators) if validators is not None else response
+
+
+@app.route('/reports')
+def reports():
+    return render_template('reports.html', reports=REPORTS.values())
+
+
+@app.route('/reports/<name>')
+def report(name):
+    if name not in REPORTS:
+        return redirect(url_for('reports'))
+    result, etag = report_cache.get_or_load(name, lambda: load_report(REPORTS[name]))
+    # отчёты строятся по нескольким таблицам и материализованным представлениям: ETag — от самого результата
+    etag = f"{etag}-{request.args.get('format', 'html')}"
+    if not_modified(etag):
+        return with_validators(Response(status=304), etag)
+    if request.args.get('format') == 'json':
+        return with_validators(jsonify(result), etag)
+    return with_validators(Response(render_template('report.html', report=result)), etag)
+
+
+def load_report(report):
+    result = run_report(get_connection(), report, REPORT_ROW_LIMIT)
+    return result, report_etag(result)
+
+
+@app.route('/clinics/<int:clinic_id>/free_slots')
+def free_slots(clinic_id):
+    """Open 30-minute slots of every vet of the clinic, ?from=YYYY-MM-DD&to=YYYY-MM-DD (a week by default)"""
+    try:
+        start = date.fromisoformat(request.args['from']) if 'from' in request.args else date.today()
+        end = date.fromisoformat(request.args['to']) if 'to' in request.args else start + timedelta(days=6)
+        vets = find_free_slots(get_connection(), clinic_id, start, end)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    return jsonify(clinic_id=clinic_id, start=start.isoformat(), end=end.isoformat(), vets=vets)
+
+
+@app.route('/pets/<int:pet_id>/history')
+def history(pet_id):
+    """Visits and vaccinations of one pet as two arrays in date order"""
+    body = pet_history(get_connection(), pet_id, history_cache)
+    if body is None:
+        return jsonify(error=f"Питомец {pet_id} не найден"), 404
+    return Response(body, mimetype='application/json')
 
-    # Получаем имена столбцов для таблицы
-    cursor.execute(f"SELECT column_name FROM information_schema.columns WHERE table_name = '{table_name}'")
-    columns = [column[0] for column in cursor.fetchall()]
 
-    return render_template('add_record.html', table_name=table_name, columns=columns)
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(db_pool.stats()), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':